@@ -0,0 +1,268 @@
+from ccDGLevels import np, Catacombs, Caves, City
+from ccDGGeom import Shape, Rectangle, Line, Band, Circle
+from ccDGGeom import ShapeSet, RectangleSet, CircleSet, PackedMask
+from contextlib import redirect_stdout
+from io import StringIO
+import json
+import os
+
+# Bump this whenever the layout of an archive changes
+archiveVersion = 2
+
+levelClasses = {cls.__name__ : cls for cls in (Catacombs, Caves, City)}
+setClasses = {cls.__name__ : cls for cls in (RectangleSet, CircleSet)}
+# Shapes get packed as rows of (kind, x, y, then up to seven more parameters)
+shapeColumns = 10
+orientCodes = "nesw"
+orientOf = {(0, -1) : 0, (1, 0) : 1, (0, 1) : 2, (-1, 0) : 3}
+
+def encodeShapes(shapes : list) -> np.array:
+	"""Pack a list of rectangles, lines, bands, and circles into one int array"""
+	rows = np.zeros((len(shapes), shapeColumns), np.int64)
+	for i, s in enumerate(shapes):
+		if isinstance(s, Rectangle):
+			row = (0, s.origin.x, s.origin.y, s.width, s.height)
+		elif isinstance(s, Line):
+			row = (1, s.origin.x, s.origin.y, s.length, orientOf[s.orient.tupl])
+		elif isinstance(s, Band):
+			row = (
+				2, s.origin.x, s.origin.y, s.length, orientOf[s.orient.tupl],
+				s.width, s.first, s.stair, s.shift, s.side
+			)
+		elif isinstance(s, Circle):
+			row = (3, s.origin.x, s.origin.y, s.radius)
+		else:
+			raise TypeError("Cannot archive a shape of type {}.".format(type(s).__name__))
+
+		rows[i, :len(row)] = row
+
+	return rows
+
+def decodeShapes(rows : np.array) -> list:
+	"""Unpack rows from encodeShapes back into a list of shapes"""
+	shapes = []
+	for row in rows.tolist():
+		kind = row[0]
+		if kind == 0:
+			shapes.append(Rectangle(*row[1:5]))
+		elif kind == 1:
+			shapes.append(Line(*row[1:4], orientCodes[row[4]]))
+		elif kind == 2:
+			shapes.append(Band(*row[1:4], orientCodes[row[4]], *row[5:10]))
+		else:
+			shapes.append(Circle(*row[1:4]))
+
+	return shapes
+
+def encodeValue(value) -> tuple:
+	"""
+	Turn one generated attribute of a level into a description for the metadata
+	and the typed arrays that hold it
+	"""
+	if isinstance(value, ShapeSet):
+		return {"kind" : "set", "set" : type(value).__name__}, {"": encodeShapes(value)}
+	if isinstance(value, np.ndarray):
+		return {"kind" : "array"}, {"": value}
+	if len(value) > 0 and isinstance(value[0], ShapeSet):
+		# A list of sets, like the carves of every room
+		return (
+			{"kind" : "setGroups", "set" : type(value[0]).__name__},
+			{
+				"": np.vstack([np.zeros((0, shapeColumns), np.int64)]
+					+ [encodeShapes(group) for group in value]),
+				"counts": np.array([len(group) for group in value], np.int64)
+			}
+		)
+	if len(value) > 0 and isinstance(value[0], list):
+		# A list of lists of plain values, like the polarities of every carve
+		return (
+			{"kind" : "listGroups"},
+			{
+				"": np.array([v for group in value for v in group]),
+				"counts": np.array([len(group) for group in value], np.int64)
+			}
+		)
+	if len(value) > 0 and isinstance(value[0], Shape):
+		return {"kind" : "shapes"}, {"": encodeShapes(value)}
+
+	return {"kind" : "list"}, {"": np.array(value)}
+
+def decodeValue(description : dict, arrays : dict):
+	"""Undo encodeValue"""
+	kind = description["kind"]
+	data = arrays[""]
+	if kind == "set":
+		return setClasses[description["set"]](decodeShapes(data))
+	if kind == "array":
+		return np.array(data)
+	if kind == "shapes":
+		return decodeShapes(data)
+	if kind == "list":
+		return data.tolist()
+
+	bounds = np.concatenate(([0], np.cumsum(arrays["counts"]))).tolist()
+	if kind == "setGroups":
+		setClass = setClasses[description["set"]]
+		return [
+			setClass(decodeShapes(data[bounds[k]:bounds[k + 1]]))
+			for k in range(len(bounds) - 1)
+		]
+
+	return [data[bounds[k]:bounds[k + 1]].tolist() for k in range(len(bounds) - 1)]
+
+class ArchiveLayers:
+	"""
+	The layer masks of an archived level, which stand in for the tuple
+	that getLayers gives; Each layer is only read in (and unpacked)
+	the first time it gets asked for
+	"""
+	def __init__(self, path : str, descriptions : list):
+		"""Requires the archive's directory and its layer descriptions"""
+		self.path = path
+		self.descriptions = descriptions
+		self.layers = [None] * len(descriptions)
+
+	def __len__(self) -> int:
+		return len(self.descriptions)
+
+	def __getitem__(self, k : int) -> np.array:
+		if self.layers[k] is None:
+			self.layers[k] = self.getWindow(k)
+
+		return self.layers[k]
+
+	def __iter__(self):
+		for k in range(len(self)):
+			yield self[k]
+
+	def getWindow(
+		self, k : int, y0 : int = 0, y1 : int = None, x0 : int = 0, x1 : int = None
+	) -> np.array:
+		"""
+		Read in part of a layer, only touching the rows it covers on disk
+		(read-only, like every other layer mask)
+		"""
+		description = self.descriptions[k]
+		blob = np.load(
+			os.path.join(self.path, description["file"]), mmap_mode = 'r'
+		)[y0:y1]
+		w = description["shape"][1]
+		layer = np.unpackbits(
+			blob, axis = 1, count = w, bitorder = description["bitorder"]
+		).view(bool)
+
+		layer = layer[:, x0:x1]
+		layer.flags.writeable = False
+		return layer
+
+class Archive:
+	"""A saved level on disk, for a level loaded from it to pull its shapes out of"""
+	def __init__(self, path : str, meta : dict):
+		"""Requires the archive's directory and its loaded metadata"""
+		self.path = path
+		self.meta = meta
+
+	def loadAttribute(self, name : str):
+		"""Read in and decode one generated attribute"""
+		description = self.meta["attributes"][name]
+		arrays = {
+			part : np.load(os.path.join(self.path, file))
+			for part, file in description["files"].items()
+		}
+		return decodeValue(description, arrays)
+
+def saveLevel(level, path : str):
+	"""
+	Save a generated level into a directory: Its class, constructor arguments,
+	seed, and random stream states go in meta.json, every generated attribute
+	gets typed arrays, and every layer mask gets its own bit-packed .npy file
+	"""
+	os.makedirs(path, exist_ok = True)
+	metaPath = os.path.join(path, "meta.json")
+	if os.path.exists(metaPath): # Overwriting, so it's half-written until the end
+		os.remove(metaPath)
+
+	seed = level.seedSequence
+	meta = {
+		"version" : archiveVersion,
+		"class" : type(level).__name__,
+		"params" : level.params,
+		"seed" : {
+			"entropy" : seed.entropy, "spawnKey" : list(seed.spawn_key),
+			"poolSize" : seed.pool_size
+		},
+		"streams" : {
+			phase : stream.bit_generator.state for phase, stream in level.streams.items()
+		},
+		"streamCounts" : level.streamCounts,
+		"attributes" : {},
+		"layers" : []
+	}
+
+	for name in level.cachedAttributes:
+		if not hasattr(level, name): # Not generated yet
+			continue
+
+		description, arrays = encodeValue(getattr(level, name))
+		description["files"] = {}
+		for part, array in arrays.items():
+			file = name + ("." + part if part else "") + ".npy"
+			np.save(os.path.join(path, file), array)
+			description["files"][part] = file
+
+		meta["attributes"][name] = description
+	# Layers get split into boolean masks the way packed levels keep them
+	# (like the caves' label image into its bits; Loaded levels already are),
+	# then each one's packed words go in as rows of bytes
+	layers = level.getLayers()
+	if not level.packedLayers and not isinstance(layers, ArchiveLayers):
+		layers = level.packLayers(layers)
+
+	for k, layer in enumerate(layers):
+		file = "layer{:d}.npy".format(k)
+		if not isinstance(layer, PackedMask):
+			layer = PackedMask(layer)
+
+		w = layer.shape[1]
+		rows = np.ascontiguousarray(layer.words).view(np.uint8)[:, :-(-w // 8)]
+		np.save(os.path.join(path, file), rows)
+		meta["layers"].append(
+			{"file" : file, "shape" : list(layer.shape), "bitorder" : "little"}
+		)
+	# The metadata goes last, so a half-written archive never loads
+	with open(metaPath, 'w') as file:
+		json.dump(meta, file, default = lambda o : o.item(), indent = "\t")
+
+def loadLevel(path : str):
+	"""
+	Load a level saved by saveLevel; Only the metadata gets read right away,
+	the shapes and layer masks are read in the first time they're used
+	"""
+	with open(os.path.join(path, "meta.json"), 'r') as file:
+		meta = json.load(file)
+
+	if meta["version"] != archiveVersion:
+		raise ValueError(
+			"Archive version {} is not supported (expected {}).".format(
+				meta["version"], archiveVersion
+			)
+		)
+
+	seed = np.random.SeedSequence(
+		meta["seed"]["entropy"], spawn_key = tuple(meta["seed"]["spawnKey"]),
+		pool_size = meta["seed"]["poolSize"]
+	)
+	with redirect_stdout(StringIO()): # Constructors like to print notices
+		level = levelClasses[meta["class"]](**meta["params"], seed = seed)
+
+	for phase, state in meta["streams"].items():
+		level.streams[phase].bit_generator.state = state
+
+	level.streamCounts.update(meta.get("streamCounts", {}))
+	# Drop the empty attributes from the constructor, so the archive fills them in
+	for name in meta["attributes"]:
+		level.__dict__.pop(name, None)
+
+	level.archive = Archive(path, meta)
+	level.layerCache = ArchiveLayers(path, meta["layers"])
+	return level
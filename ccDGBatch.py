@@ -0,0 +1,83 @@
+from ccDGLevels import Level
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import redirect_stdout
+from io import StringIO
+from os import cpu_count
+
+def generateLevel(
+	levelClass : type, params : dict, seed, masksOnly : bool = False
+) -> tuple:
+	"""
+	Construct and generate one level from a seed, with its progress printouts
+	swallowed; Gives back the seed with the level (or just its image masks)
+	"""
+	with redirect_stdout(StringIO()):
+		level = levelClass(**params, seed = seed)
+		level.gen()
+
+	if masksOnly:
+		return seed, level.getImageData()
+
+	return seed, level
+
+def generateChunk(
+	levelClass : type, params : dict, seeds : list, masksOnly : bool = False
+) -> list:
+	"""Generate a run of levels in one go, so each worker call does enough work"""
+	return [generateLevel(levelClass, params, seed, masksOnly) for seed in seeds]
+
+def generateLevels(
+	levelClass : type, params : dict, seeds,
+	workers : int = 0, chunkSize : int = 1,
+	masksOnly : bool = False, maxInFlight : int = 0
+):
+	"""
+	Generate a level of one class with the same (keyword) parameters
+	for every seed, across a pool of worker processes; Yields pairs of
+	(seed, level) (or (seed, image masks)) in whatever order they finish.
+
+	Seeds get sent off chunkSize at a time, and no more than maxInFlight chunks
+	(twice the worker count by default) are out at once,
+	so memory stays bounded however many seeds there are;
+	The parameters can't include a seed, since every level gets its own
+	"""
+	# Checked here rather than in the pool, so bad arguments fail on the call
+	if not issubclass(levelClass, Level):
+		raise TypeError("Please pass a subclass of Level to generate.")
+	if "seed" in params:
+		raise ValueError(
+			"Please pass seeds through the seeds argument, not in params "
+			"(each level gets its own seed from there)."
+		)
+
+	if workers <= 0:
+		workers = cpu_count() or 1
+	if maxInFlight <= 0:
+		maxInFlight = 2 * workers
+
+	return poolLevels(
+		levelClass, params, iter(seeds), workers, max(1, chunkSize),
+		masksOnly, maxInFlight
+	)
+
+def poolLevels(
+	levelClass : type, params : dict, seeds,
+	workers : int, chunkSize : int, masksOnly : bool, maxInFlight : int
+):
+	"""Run generateLevels' pool, once its arguments have been checked"""
+	with ProcessPoolExecutor(workers) as pool:
+		pending = set()
+		while True:
+			chunk = [seed for _, seed in zip(range(chunkSize), seeds)]
+			if len(chunk) > 0:
+				pending.add(
+					pool.submit(generateChunk, levelClass, params, chunk, masksOnly)
+				)
+			# Hand back finished chunks once the pool is full or the seeds run out
+			if len(pending) >= maxInFlight or (len(chunk) == 0 and len(pending) > 0):
+				done, pending = wait(pending, return_when = FIRST_COMPLETED)
+				for future in done:
+					yield from future.result()
+
+			elif len(chunk) == 0:
+				break
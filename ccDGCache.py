@@ -0,0 +1,120 @@
+from hashlib import sha256
+import os
+import pickle
+
+# Bump this whenever what gets stored changes, so stale entries never get hit
+cacheVersion = 3
+
+class LevelCache:
+	"""On-disk cache of generated levels, addressed by what generated them"""
+	def __init__(self, directory : str, maxBytes : int = 1 << 30):
+		"""
+		Requires a directory to keep entries in (made if needed);
+		Optionally, a cap on the total size of the entries can be given,
+		past which the least recently used ones get evicted
+		"""
+		self.directory = directory
+		self.maxBytes = maxBytes
+		os.makedirs(self.directory, exist_ok = True)
+
+	def __str__(self) -> str:
+		"""String representation"""
+		return "Level cache at {} holding {} of at most {} bytes".format(
+			self.directory, self.getSize(), self.maxBytes
+		)
+
+	def __repr__(self) -> str:
+		"""Generic representation"""
+		return self.__str__()
+
+	def getKey(self, level, phase : str, args : tuple = (), prior : str = None) -> str:
+		"""
+		Hash together the level's class, constructor arguments, seed, and how many
+		times each phase has been generated since seeding, with a phase
+		of generation, its arguments, and the key of the state it was generated
+		on top of (if any)
+		"""
+		seed = level.seedSequence
+		description = repr((
+			cacheVersion, type(level).__name__,
+			sorted(level.params.items()),
+			seed.entropy, seed.spawn_key, seed.pool_size,
+			sorted(level.streamCounts.items()),
+			phase, tuple(args), prior
+		))
+		return sha256(description.encode()).hexdigest()
+
+	def getPath(self, key : str) -> str:
+		"""Where an entry lives on disk"""
+		return os.path.join(self.directory, key + ".pkl")
+
+	def load(self, key : str):
+		"""Get an entry back, or None if it isn't cached"""
+		path = self.getPath(key)
+		try:
+			with open(path, "rb") as file:
+				value = pickle.load(file)
+		except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+			return None
+		# Touch the entry so it counts as recently used
+		try:
+			os.utime(path)
+		except FileNotFoundError:
+			pass
+
+		return value
+
+	def store(self, key : str, value):
+		"""Save an entry, then evict old ones until everything fits"""
+		path = self.getPath(key)
+		# Write to the side then swap it in, so readers never see half an entry
+		temp = "{}.{}.tmp".format(path, os.getpid())
+		with open(temp, "wb") as file:
+			pickle.dump(value, file, pickle.HIGHEST_PROTOCOL)
+
+		os.replace(temp, path)
+		self.evict()
+
+	def getEntries(self) -> list:
+		"""Every entry as (last used time, size, path), least recently used first"""
+		entries = []
+		for name in os.listdir(self.directory):
+			if not name.endswith(".pkl"):
+				continue
+
+			path = os.path.join(self.directory, name)
+			try:
+				stat = os.stat(path)
+			except FileNotFoundError:
+				continue # Evicted by someone else in the meantime
+
+			entries.append((stat.st_mtime, stat.st_size, path))
+
+		return sorted(entries)
+
+	def getSize(self) -> int:
+		"""Total size of every entry in bytes"""
+		return sum(size for _, size, _ in self.getEntries())
+
+	def evict(self):
+		"""Remove the least recently used entries until the size cap is met"""
+		entries = self.getEntries()
+		total = sum(size for _, size, _ in entries)
+		for _, size, path in entries:
+			if total <= self.maxBytes:
+				break
+
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+
+			total -= size
+
+	def clear(self):
+		"""Remove every entry"""
+		for _, _, path in self.getEntries():
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
@@ -1,4 +1,5 @@
 import numpy as np
+from collections import OrderedDict
 np.set_printoptions(
 	linewidth = 128, precision = 3,
 	formatter = {"bool" : lambda b : '#' if b else '_'}
@@ -7,21 +8,43 @@ np.set_printoptions(
 from ccDocMaker import getDocStringWithArgs
 
 class Point:
-	"""Numpy supporting point class"""
+	"""
+	Lightweight integer point class with numpy support on demand;
+	Points compare and hash by value, so equal coordinates collapse in sets
+	"""
+	__slots__ = ("x", "y", "nparCache")
+
 	def __init__(self, x : int, y : int):
 		"""Needs a coordinate"""
-		self.x = x
-		self.y = y
-		self.dict = {'y': y, 'x': x}
-		self.npar = np.array([y, x], int)
-		self.tupl = (x, y)
+		self.x = int(x)
+		self.y = int(y)
+		self.nparCache = None
 
 	__init__.__doc__ += getDocStringWithArgs(
 		__init__,
 		["horizontal coordinate", "vertical coordinate"],
 		4, True, [".x", ".y"]
 	)
-	
+
+	@property
+	def npar(self) -> np.array:
+		"""Numpy array of the point in (y, x) order, only made when asked for"""
+		if self.nparCache is None:
+			self.nparCache = np.array([self.y, self.x], int)
+			self.nparCache.setflags(write = False) # Shared, so hands off
+
+		return self.nparCache
+
+	@property
+	def tupl(self) -> tuple:
+		"""Tuple of the point in (x, y) order"""
+		return (self.x, self.y)
+
+	@property
+	def dict(self) -> dict:
+		"""Dictionary of the point"""
+		return {'y': self.y, 'x': self.x}
+
 	def __str__(self) -> str:
 		"""String representation"""
 		return str(self.tupl)
@@ -30,33 +53,241 @@ class Point:
 		"""Generic representation (just uses __str__)"""
 		return self.__str__()
 
+	def __eq__(self, other) -> bool:
+		if not isinstance(other, Point):
+			return NotImplemented
+		return self.x == other.x and self.y == other.y
+
+	def __hash__(self) -> int:
+		return hash((self.x, self.y))
+
+	def __getstate__(self) -> tuple:
+		return (self.x, self.y)
+
+	def __setstate__(self, state):
+		if isinstance(state, dict): # Pickled back when points had a __dict__
+			state = (state['x'], state['y'])
+		self.x, self.y = int(state[0]), int(state[1])
+		self.nparCache = None
+
 	# Arithmetic operators
+	# Note: numpy arrays are taken to be in (y, x) order, just like .npar
 	def __add__(self, other):
-		if type(other) in (int, float):
-			p = self.npar + other
-		else:
-			p = self.npar + other.npar
-		return Point(p[1], p[0])
+		if isinstance(other, Point):
+			return Point(self.x + other.x, self.y + other.y)
+		elif isinstance(other, np.ndarray):
+			return Point(self.x + other[1], self.y + other[0])
+		return Point(self.x + other, self.y + other)
 	def __sub__(self, other):
-		if type(other) in (int, float):
-			p = self.npar - other
-		else:
-			p = self.npar - other.npar
-		return Point(p[1], p[0])
+		if isinstance(other, Point):
+			return Point(self.x - other.x, self.y - other.y)
+		elif isinstance(other, np.ndarray):
+			return Point(self.x - other[1], self.y - other[0])
+		return Point(self.x - other, self.y - other)
 	def __mul__(self, scalar : int):
-		# Note: happens to work with numpy arrays of the same shape
-		# because type "hints" aren't strictly enforced
-		p = self.npar * scalar
-		return Point(p[1], p[0])
-	def __floordiv__(self, divisor : np.array):
-		# Ditto
-		p = self.npar // divisor
-		return Point(p[1], p[0])
+		if isinstance(scalar, np.ndarray):
+			return Point(self.x * scalar[1], self.y * scalar[0])
+		return Point(self.x * scalar, self.y * scalar)
+	def __floordiv__(self, divisor : int):
+		if isinstance(divisor, np.ndarray):
+			return Point(self.x // divisor[1], self.y // divisor[0])
+		return Point(self.x // divisor, self.y // divisor)
 
 	def __or__(self, other) -> int:
 		"""Manhattan a.k.a. taxicab distance"""
 		return abs(self.x - other.x) + abs(self.y - other.y)
 
+def clipWindow(frameShape : tuple, offset : Point, localShape : tuple) -> tuple:
+	"""
+	Clip a local array placed at an offset (its northwest corner) to a frame;
+	Returns a pair of slice tuples (frame, local), or None if nothing lands
+	inside of the frame
+	"""
+	fh, fw = frameShape[:2]
+	lh, lw = localShape[:2]
+	# Northwest and southeast corners, clamped into the frame
+	x0 = max(offset.x, 0)
+	y0 = max(offset.y, 0)
+	x1 = min(offset.x + lw, fw)
+	y1 = min(offset.y + lh, fh)
+
+	if x0 >= x1 or y0 >= y1:
+		return None
+
+	return (
+		(slice(y0, y1), slice(x0, x1)),
+		(
+			slice(y0 - offset.y, y1 - offset.y),
+			slice(x0 - offset.x, x1 - offset.x)
+		)
+	)
+
+def stampMask(M : np.array, local : np.array, offset : Point) -> np.array:
+	"""
+	OR a local mask into a caller-owned frame through a slice,
+	dropping whatever falls outside of the frame
+	"""
+	window = clipWindow(M.shape, offset, local.shape)
+	if window is not None:
+		M[window[0]] |= local[window[1]]
+
+	return M
+
+def intersectBounds(a : tuple, b : tuple) -> tuple:
+	"""
+	Intersect two bounding boxes (x0, y0, x1, y1), or get None
+	if they don't share any cells
+	"""
+	x0 = max(a[0], b[0])
+	y0 = max(a[1], b[1])
+	x1 = min(a[2], b[2])
+	y1 = min(a[3], b[3])
+
+	if x0 >= x1 or y0 >= y1:
+		return None
+
+	return (x0, y0, x1, y1)
+
+def rasterizeBoxes(boxes : np.array, fw : int, fh : int, minBatch : int = 128) -> np.array:
+	"""
+	Rasterize the union of many boxes, as rows of (x0, y0, x1, y1), all at once;
+	Each box adds +1/-1 at its four corners into a difference array,
+	then two running sums resolve how many boxes cover every cell
+	(under minBatch boxes, slicing them in one by one is cheaper)
+	"""
+	B = np.asarray(boxes, int).reshape(-1, 4)
+	# Clip to the frame and drop whatever ends up empty
+	B = np.clip(B, 0, (fw, fh, fw, fh))
+	B = B[(B[:, 0] < B[:, 2]) & (B[:, 1] < B[:, 3])]
+
+	if B.shape[0] < minBatch:
+		mask = np.zeros((fh, fw), bool)
+		for x0, y0, x1, y1 in B.tolist():
+			mask[y0:y1, x0:x1] = True
+
+		return mask
+
+	x0, y0, x1, y1 = B.T
+	# The difference array has one more row and column than the frame
+	D = np.zeros((fh + 1, fw + 1), np.int32)
+	np.add.at(
+		D, (np.concatenate((y0, y1, y0, y1)), np.concatenate((x0, x1, x1, x0))),
+		np.repeat(np.array((1, 1, -1, -1), np.int32), B.shape[0])
+	)
+	D.cumsum(axis = 0, out = D)
+	D.cumsum(axis = 1, out = D)
+	return D[:fh, :fw] > 0
+
+def collectBoxes(shapes) -> np.array:
+	"""
+	Stack up the boxes of many rectangles, lines, and bands
+	(or a whole RectangleSet) as rows of (x0, y0, x1, y1), for rasterizeBoxes
+	"""
+	if isinstance(shapes, RectangleSet):
+		return shapes.getBoxes()
+
+	return np.vstack([np.zeros((0, 4), int)] + [s.getBoxes() for s in shapes])
+
+class PackedMask:
+	"""
+	Boolean mask packed 64 cells to a word along each row (1/8th the memory),
+	with the same set algebra (&, |, ^, ~) as a boolean array,
+	done a whole word at a time
+	"""
+	# Keep numpy from unpacking these to do its own operators instead of ours
+	__array_ufunc__ = None
+
+	def __init__(self, mask : np.array = None, shape : tuple = None, words : np.array = None):
+		"""
+		Needs a 2D boolean mask to pack;
+		Or, the shape of the mask and its already packed words
+		"""
+		if words is not None:
+			self.shape = tuple(shape)
+			self.words = words
+			return
+
+		mask = np.asarray(mask, bool)
+		self.shape = mask.shape
+		h, w = self.shape
+		# Little bit order, so cell x lands on bit x % 64 of word x // 64
+		packed = np.zeros((h, 8 * (-(-w // 64))), np.uint8)
+		packed[:, :-(-w // 8)] = np.packbits(mask, axis = 1, bitorder = "little")
+		self.words = packed.view("<u8")
+
+	def __str__(self) -> str:
+		"""String representation"""
+		return "A {} wide by {} tall packed mask of {} words.".format(
+			self.shape[1], self.shape[0], self.words.size
+		)
+
+	def __repr__(self) -> str:
+		"""Generic representation (just uses __str__)"""
+		return self.__str__()
+
+	def wrap(self, words : np.array):
+		"""Make a packed mask of the same shape out of new words"""
+		return PackedMask(shape = self.shape, words = words)
+
+	def getWords(self, other) -> np.array:
+		"""Get the words of another mask, packing it first if it's an array"""
+		if not isinstance(other, PackedMask):
+			other = PackedMask(other)
+
+		return other.words
+
+	def __and__(self, other):
+		return self.wrap(self.words & self.getWords(other))
+
+	def __or__(self, other):
+		return self.wrap(self.words | self.getWords(other))
+
+	def __xor__(self, other):
+		return self.wrap(self.words ^ self.getWords(other))
+
+	__rand__ = __and__
+	__ror__ = __or__
+	__rxor__ = __xor__
+
+	def __invert__(self):
+		"""Flip every cell, leaving the padding past the last column off"""
+		w = self.shape[1]
+		tail = np.full(self.words.shape[1:], ~np.uint64(0), "<u8")
+		if w % 64 != 0:
+			tail[-1] = (np.uint64(1) << np.uint64(w % 64)) - np.uint64(1)
+
+		return self.wrap(~self.words & tail)
+
+	def __array__(self, dtype = None, copy = None) -> np.array:
+		"""Unpack when handed to numpy"""
+		mask = self.unpack()
+		return mask if dtype is None else mask.astype(dtype)
+
+	@property
+	def flags(self):
+		"""The flags of the words, so a packed mask can be made read-only like an array"""
+		return self.words.flags
+
+	@property
+	def nbytes(self) -> int:
+		return self.words.nbytes
+
+	def unpack(self) -> np.array:
+		"""Get the mask back out as a 2D boolean array"""
+		return np.unpackbits(
+			self.words.view(np.uint8), axis = 1, count = self.shape[1], bitorder = "little"
+		).view(bool)
+
+	def copy(self):
+		return self.wrap(self.words.copy())
+
+	def any(self) -> bool:
+		return bool(self.words.any())
+
+	def count(self) -> int:
+		"""How many cells are set"""
+		return int(np.unpackbits(self.words.view(np.uint8)).sum())
+
 class Shape:
 	"""Base shape class"""
 	def getCentroid(self) -> Point:
@@ -71,18 +302,93 @@ class Shape:
 		"""Placeholder, subclass must implement!"""
 		return np.zeros(1, bool)
 
+	def getBounds(self) -> tuple:
+		"""
+		Determine the bounding box of the shape as (x0, y0, x1, y1),
+		where the southeast corner is exclusive (like a slice);
+		Subclasses should override this with something tighter
+		"""
+		f = self.getMinFrame()
+		return (0, 0, f.x, f.y)
+
+	def getLocalMaskFill(self) -> tuple:
+		"""
+		Get a binary numpy mask array with the shape filled in,
+		cropped to its bounding box, along with the offset of that box
+		"""
+		x0, y0, x1, y1 = self.getBounds()
+		return self.getMaskFill(x1, y1)[y0:, x0:], Point(x0, y0)
+
+	def stampFill(self, M : np.array) -> np.array:
+		"""OR the filled in shape into an existing frame"""
+		return stampMask(M, *self.getLocalMaskFill())
+
 	def isInBounds(self, frame : Point) -> bool:
 		"""Determine if the shape fits with an arbitrary frame"""
 		return np.all(self.getMinFrame().npar <= frame.npar)
 
-	def overlaps(self, other) -> bool:
-		"""Use the mask method to determine if this rectangle overlaps with another"""
+	def getWindowMaskFill(self, window : tuple) -> np.array:
+		"""
+		Get the filled in shape cropped to an arbitrary window (x0, y0, x1, y1);
+		Only the bounding box of the shape gets rasterized
+		"""
+		x0, y0, x1, y1 = window
+		M = np.zeros((y1 - y0, x1 - x0), bool)
+		local, offset = self.getLocalMaskFill()
+
+		return stampMask(M, local, offset - Point(x0, y0))
+
+	def overlapsRasterized(self, other) -> bool:
+		"""Use the mask method to determine if this shape overlaps with another"""
 		smf = self.getMinFrame()
 		omf = other.getMinFrame()
 		w = max(smf.x, omf.x)
 		h = max(smf.y, omf.y)
 		return np.count_nonzero(self.getMaskFill(w, h) & other.getMaskFill(w, h)) > 0
 
+	def overlaps(self, other) -> bool:
+		"""
+		Determine if this shape overlaps with another;
+		Pairs of rectangles, lines, and circles are decided in closed form
+		wherever possible, then by rasterizing only the window the two
+		bounding boxes share; Anything else falls back on the mask method
+		"""
+		if not isinstance(self, (Rectangle, Line, Band, Circle)) \
+			or not isinstance(other, (Rectangle, Line, Band, Circle)):
+			return self.overlapsRasterized(other)
+
+		window = intersectBounds(self.getBounds(), other.getBounds())
+		if window is None: # Bounding boxes don't even touch
+			return False
+
+		if isinstance(self, Band) or isinstance(other, Band):
+			pass # Staggered bands aren't boxes, so just rasterize the window
+		elif isinstance(self, Circle) and isinstance(other, Circle):
+			d2 = (self.origin.x - other.origin.x) ** 2 \
+				+ (self.origin.y - other.origin.y) ** 2
+			if d2 <= max(self.radius, other.radius) ** 2:
+				return True # One center sits inside the other disc
+			if d2 > (self.radius + other.radius + 2) ** 2:
+				return False
+		elif isinstance(self, Circle) or isinstance(other, Circle):
+			circle, box = (self, other) if isinstance(self, Circle) else (other, self)
+			x0, y0, x1, y1 = box.getBounds()
+			# Distance from the center to the nearest cell of the box
+			dx = max(x0 - circle.origin.x, 0, circle.origin.x - x1 + 1)
+			dy = max(y0 - circle.origin.y, 0, circle.origin.y - y1 + 1)
+			# Discs hold every cell within r of the center,
+			# and nothing at r + 1 or beyond
+			if dx ** 2 + dy ** 2 <= circle.radius ** 2:
+				return True
+			if dx ** 2 + dy ** 2 >= (circle.radius + 1) ** 2:
+				return False
+		else: # Rectangles and lines are boxes, so overlapping boxes is enough
+			return True
+		# Only the ambiguous ring near the rims is left to rasterize
+		return bool(
+			np.any(self.getWindowMaskFill(window) & other.getWindowMaskFill(window))
+		)
+
 	def __and__(self, other) -> bool:
 		"""
 		Turn the overlap method into an operator (not commutative!)
@@ -124,7 +430,27 @@ class Rectangle(Shape):
 		self.height = abs(h)
 		self.width = abs(w)
 		self.area = self.height * self.width
-		self.refreshEdgeCells()
+		# Edge cells and azimuths are left until something asks for them
+
+	# Attributes that refreshEdgeCells produces
+	edgeAttributes = (
+		"corners", "azi45", "azi135", "azi225", "azi315",
+		"edgeCellsNorth", "edgeCellsWest", "edgeCellsSouth", "edgeCellsEast",
+		"edgeCells"
+	)
+
+	def __getattr__(self, name : str):
+		"""
+		Compute the edge cells and azimuths the first time any of them are
+		accessed; They become plain attributes afterwards, so this only runs once
+		"""
+		if name in Rectangle.edgeAttributes:
+			self.refreshEdgeCells()
+			return self.__dict__[name]
+
+		raise AttributeError(
+			"'Rectangle' object has no attribute '{:s}'".format(name)
+		)
 	
 	def __str__(self) -> str:
 		"""String representation"""
@@ -193,6 +519,40 @@ class Rectangle(Shape):
 		"""Determine the minimum graphic frame for the rectangle"""
 		return self.origin + Point(self.width, self.height)
 
+	def getBounds(self) -> tuple:
+		"""Determine the bounding box of the rectangle (which is itself)"""
+		return (
+			self.origin.x, self.origin.y,
+			self.origin.x + self.width, self.origin.y + self.height
+		)
+
+	def getBoxes(self) -> np.array:
+		"""Get the rectangle as a single row of (x0, y0, x1, y1), for rasterizeBoxes"""
+		return np.array([self.getBounds()], int)
+
+	def getLocalMaskFill(self) -> tuple:
+		"""Get the filled in rectangle cropped to itself, plus its offset"""
+		return np.ones((self.height, self.width), bool), self.origin
+
+	def getLocalMaskEdge(self) -> tuple:
+		"""Get the rectangle's edge cropped to itself, plus its offset"""
+		M = np.ones((self.height, self.width), bool)
+		M[1:-1, 1:-1] = 0
+
+		return M, self.origin
+
+	def stampFill(self, M : np.array) -> np.array:
+		"""OR the filled in rectangle into an existing frame"""
+		window = clipWindow(M.shape, self.origin, (self.height, self.width))
+		if window is not None: # No local array needed, just a slice
+			M[window[0]] = 1
+
+		return M
+
+	def stampEdge(self, M : np.array) -> np.array:
+		"""OR the rectangle's edge into an existing frame"""
+		return stampMask(M, *self.getLocalMaskEdge())
+
 	def getMaskFill(self, fw : int = 0, fh : int = 0) -> np.array:
 		"""
 		Get a binary numpy mask array with the rectangle filled in,
@@ -202,37 +562,31 @@ class Rectangle(Shape):
 			f = self.getMinFrame()
 			fw = f.x
 			fh = f.y
-		
-		M = np.zeros((fh, fw), bool)
-		
-		M[
-			self.origin.y : self.origin.y + self.height,
-			self.origin.x : self.origin.x + self.width
-		] = 1
-		
-		return M
+
+		return self.stampFill(np.zeros((fh, fw), bool))
 
 	def getMaskEdge(self, fw : int = 0, fh : int = 0) -> np.array:
 		"""
 		Get a binary numpy mask array with the rectangle's edge only,
 		to arbitrary frame size
 		"""
-		M = self.getMaskFill(fw, fh)
-		
-		M[
-			self.origin.y + 1 : self.origin.y + self.height - 1,
-			self.origin.x + 1 : self.origin.x + self.width - 1
-		] = 0
-		
-		return M
+		if fw == 0 or fh == 0:
+			f = self.getMinFrame()
+			fw = f.x
+			fh = f.y
+
+		return self.stampEdge(np.zeros((fh, fw), bool))
 
 	def percentOverlap(self, other) -> float:
 		"""Compute the percentage of how much of this rectangle overlaps with another"""
-		smf = self.getMinFrame()
-		omf = other.getMinFrame()
-		w = max(smf.x, omf.x)
-		h = max(smf.y, omf.y)
-		return np.count_nonzero(self.getMaskFill(w, h) & other.getMaskFill(w, h)) / self.area
+		window = intersectBounds(self.getBounds(), other.getBounds())
+		if window is None:
+			return 0.
+
+		if isinstance(other, (Rectangle, Line)): # Area of the shared box
+			return (window[2] - window[0]) * (window[3] - window[1]) / self.area
+
+		return np.count_nonzero(other.getWindowMaskFill(window)) / self.area
 
 	def getNearestWall(self, other) -> tuple:
 		"""Determine the closest wall that faces another rectangle"""
@@ -290,37 +644,49 @@ class Line(Shape):
 		"""Determine if the line fits within an arbitrary frame"""
 		return np.all(self.getMinFrame().npar <= frame.npar)
 
+	def getBounds(self) -> tuple:
+		"""Determine the bounding box of the line (empty if it has no length)"""
+		if self.length == 0:
+			return (self.origin.x, self.origin.y, self.origin.x, self.origin.y)
+
+		e = self.getEndpoint()
+		return (
+			min(self.origin.x, e.x), min(self.origin.y, e.y),
+			max(self.origin.x, e.x) + 1, max(self.origin.y, e.y) + 1
+		)
+
+	def getBoxes(self) -> np.array:
+		"""Get the line as a single row of (x0, y0, x1, y1), for rasterizeBoxes"""
+		return np.array([self.getBounds()], int)
+
+	def getLocalMask(self) -> tuple:
+		"""Get the line cropped to itself, plus its offset"""
+		x0, y0, x1, y1 = self.getBounds()
+		return np.ones((y1 - y0, x1 - x0), bool), Point(x0, y0)
+
+	def stamp(self, M : np.array) -> np.array:
+		"""OR the line into an existing frame"""
+		x0, y0, x1, y1 = self.getBounds()
+		window = clipWindow(M.shape, Point(x0, y0), (y1 - y0, x1 - x0))
+		if window is not None: # No local array needed, just a slice
+			M[window[0]] = 1
+
+		return M
+
 	def getMask(self, fw : int = 0, fh : int = 0) -> np.array:
 		"""Get a binary numpy mask array with the line drawn, arbitrary frame size"""
-		pi = self.origin
-		pf = pi + self.orient * self.length
-		# the abs-abs thing is for the slice to work properly
-		sliceCompensate = np.abs(np.abs(self.orient.npar) - 1)
-		pSC = Point(sliceCompensate[1], sliceCompensate[0])
-		# Flip if need be for the slice to work properly
-		if pi.x > pf.x:
-			xt = pf.x
-			pf = Point(pi.x + 1, pf.y)
-			pi = Point(xt + 1, pi.y)
-		if pi.y > pf.y:
-			yt = pf.y
-			pf = Point(pf.x, pi.y + 1)
-			pi = Point(pi.x, yt + 1)
-		# Apply slice compensation
-		pf = pf + pSC
-		# Apply northwest culling
-		northwestCull = np.maximum(pi.npar, np.zeros(2, int))
-		pi = Point(northwestCull[1], northwestCull[0])
-
 		if fw == 0 or fh == 0:
-			fw = pf.x
-			fh = pf.y
-			
-		M = np.zeros((fh, fw), bool)
-		
-		M[pi.y:pf.y, pi.x:pf.x] = 1
-		
-		return M
+			x0, y0, fw, fh = self.getBounds()
+
+		return self.stamp(np.zeros((fh, fw), bool))
+
+	def getLocalMaskFill(self) -> tuple:
+		"""Allow for interoperability with rectangles and circles"""
+		return self.getLocalMask()
+
+	def stampFill(self, M : np.array) -> np.array:
+		"""Allow for interoperability with rectangles and circles"""
+		return self.stamp(M)
 
 	def getMaskFill(self, fw : int = 0, fh : int = 0) -> np.array:
 		"""Allow for interoperability with overlaps for rectangles and circles"""
@@ -354,13 +720,372 @@ class Line(Shape):
 			return ('e', Point(1, 0))
 		return ()
 
+class Band(Shape):
+	"""
+	Numpy supporting thick line class; A stack of parallel lines side by side,
+	which can be staggered into a staircase, that rasterizes all at once
+	"""
+	def __init__(
+		self, x : int, y : int, l : int, o : str, w : int = 1,
+		first : int = 0, stair : int = 0, shift : int = 0, side : int = 1
+	):
+		"""
+		Needs a coordinate, a length, and an orientation (like a line);
+		Optionally, a width (how many lines), where to start in the sequence
+		of sideways offsets 0, 1, -1, 2, -2, ..., how much longer each line gets
+		per step sideways, how much further forward each line starts per step
+		sideways, and which way counts as sideways (1 or -1)
+		"""
+		o = o.lower()[0]
+		self.origin = Point(x, y)
+		self.length = l # Lines take the absolute value of their length, per line
+		self.orient = Point(
+			-1 if o == 'w' else 1 if o == 'e' else 0,
+			-1 if o == 'n' else 1 if o == 's' else 0
+		)
+		self.width = max(0, w)
+		self.first = first
+		self.stair = stair
+		self.shift = shift
+		self.side = side
+		self.refreshBoxes()
+
+	def __str__(self):
+		"""String representation"""
+		return "A {: 4d} line wide, {: 4d} cell long band starting from {} headed {}.".format(
+			self.width, self.length, self.origin, {
+				(1, 0) : "east", (-1, 0) : "west", (0, 1) : "south", (0, -1) : "north"
+			}[self.orient.tupl]
+		)
+
+	def __repr__(self):
+		"""Generic representation (just uses __str__)"""
+		return self.__str__()
+
+	def getOffsets(self) -> list:
+		"""Determine how far sideways each line sits"""
+		return [ # 0, 1, -1, 2, -2, ...
+			self.side * ((n + 1) // 2 if n % 2 == 1 else -(n // 2))
+			for n in range(self.first, self.first + self.width)
+		]
+
+	def getLines(self) -> list:
+		"""Break the band back up into individual lines"""
+		o = {(1, 0) : 'e', (-1, 0) : 'w', (0, 1) : 's', (0, -1) : 'n'}[self.orient.tupl]
+		lateral = Point(abs(self.orient.y), abs(self.orient.x))
+		return [
+			Line(
+				self.origin.x + (lateral.x + self.orient.x * self.shift) * q,
+				self.origin.y + (lateral.y + self.orient.y * self.shift) * q,
+				self.length + self.stair * q, o
+			)
+			for q in self.getOffsets()
+		]
+
+	def refreshBoxes(self):
+		"""
+		Work out the bounding box of every line with any length, the box around
+		all of them, and whether they fill that box with no gaps or stagger
+		(Call this after changing the band's parameters)
+		"""
+		vertical = self.orient.x == 0
+		sign = self.orient.y if vertical else self.orient.x
+		# Coordinates along the band and across it
+		a, c = (self.origin.y, self.origin.x) if vertical else (self.origin.x, self.origin.y)
+		boxes = []
+		for q in self.getOffsets():
+			l = abs(self.length + self.stair * q)
+			if l == 0:
+				continue
+
+			start = a + sign * self.shift * q
+			lo = start if sign > 0 else start - l + 1
+			boxes.append(
+				(c + q, lo, c + q + 1, lo + l) if vertical else (lo, c + q, lo + l, c + q + 1)
+			)
+
+		self.boxes = np.array(boxes, int).reshape(-1, 4)
+		if len(boxes) == 0:
+			self.bounds = (self.origin.x, self.origin.y, self.origin.x, self.origin.y)
+			self.filled = True
+			return
+
+		self.bounds = tuple(
+			int(v) for v in (*self.boxes[:, :2].min(axis = 0), *self.boxes[:, 2:].max(axis = 0))
+		)
+		along, across = ((1, 3), 0) if vertical else ((0, 2), 1)
+		self.filled = bool(np.all(self.boxes[:, along] == self.boxes[0, along])) \
+			and self.bounds[across + 2] - self.bounds[across] == len(boxes)
+
+	def getBoxes(self) -> np.array:
+		"""Get the bounding box of every line with any length, as rows of (x0, y0, x1, y1)"""
+		return self.boxes
+
+	def getCentroid(self) -> Point:
+		"""Determine the center cell of the middle line"""
+		return self.origin + self.orient * (abs(self.length) // 2)
+
+	def getBounds(self) -> tuple:
+		"""Determine the bounding box of the whole band (empty if it has no cells)"""
+		return self.bounds
+
+	def getMinFrame(self) -> Point:
+		"""Determine the minimum graphic frame for the band"""
+		return Point(self.bounds[2], self.bounds[3])
+
+	def isInBounds(self, frame : Point) -> bool:
+		"""Determine if the band fits within an arbitrary frame"""
+		return np.all(self.getMinFrame().npar <= frame.npar)
+
+	def getLocalMask(self) -> tuple:
+		"""Get the band cropped to itself, plus its offset"""
+		x0, y0, x1, y1 = self.bounds
+		if self.filled:
+			return np.ones((y1 - y0, x1 - x0), bool), Point(x0, y0)
+		# One comparison of every line's stretch against the span of the band
+		B = self.boxes
+		if self.orient.x == 0:
+			Y = np.arange(y0, y1)
+			M = np.zeros((x1 - x0, y1 - y0), bool)
+			M[B[:, 0] - x0] = (Y >= B[:, 1, np.newaxis]) & (Y < B[:, 3, np.newaxis])
+			M = M.T
+		else:
+			X = np.arange(x0, x1)
+			M = np.zeros((y1 - y0, x1 - x0), bool)
+			M[B[:, 1] - y0] = (X >= B[:, 0, np.newaxis]) & (X < B[:, 2, np.newaxis])
+
+		return M, Point(x0, y0)
+
+	def stamp(self, M : np.array) -> np.array:
+		"""OR the band into an existing frame"""
+		if not self.filled:
+			return stampMask(M, *self.getLocalMask())
+
+		x0, y0, x1, y1 = self.bounds
+		window = clipWindow(M.shape, Point(x0, y0), (y1 - y0, x1 - x0))
+		if window is not None: # No local array needed, just a slice
+			M[window[0]] = 1
+
+		return M
+
+	def getMask(self, fw : int = 0, fh : int = 0) -> np.array:
+		"""Get a binary numpy mask array with the band drawn, arbitrary frame size"""
+		if fw == 0 or fh == 0:
+			x0, y0, fw, fh = self.bounds
+
+		return self.stamp(np.zeros((fh, fw), bool))
+
+	def getLocalMaskFill(self) -> tuple:
+		"""Allow for interoperability with rectangles and circles"""
+		return self.getLocalMask()
+
+	def stampFill(self, M : np.array) -> np.array:
+		"""Allow for interoperability with rectangles and circles"""
+		return self.stamp(M)
+
+	def getMaskFill(self, fw : int = 0, fh : int = 0) -> np.array:
+		"""Allow for interoperability with overlaps for rectangles and circles"""
+		return self.getMask(fw, fh)
+
+def isqrtVectorized(N : np.array) -> np.array:
+	"""Integer square roots (floors) of an array of non-negative integers"""
+	R = np.sqrt(N).astype(int)
+	# Floating point can land one off in either direction, so nudge it back
+	R -= R * R > N
+	R += (R + 1) * (R + 1) <= N
+	return R
+
+def getCircleEdgeOffsets(radius : int, charliesMethod : bool = True) -> np.array:
+	"""
+	Use a version of the midpoint circle algorithm to compute
+	the edge cells of a circle centered on (0, 0), as rows of (x, y)
+
+	Only integers are involved: Charlie's Method has a closed form per row,
+	so quadrant 1 comes out in a single vectorized pass, while the standard
+	method walks the first octant (the walk is symmetric about the diagonal);
+	The rest of the circle is mirrored with index arithmetic
+	"""
+	radius = int(radius)
+	threshold = radius ** 2 + int(radius ** 0.5)
+
+	if charliesMethod:
+		# The walk always takes the farthest out cell within the threshold,
+		# so row y starts at the widest x with x^2 + y^2 <= threshold,
+		# then runs inward until it can step up (or diagonally up) a row
+		Y = np.arange(isqrtVectorized(np.array(threshold)) + 2)
+		reach = threshold - Y * Y
+		widest = np.where(reach >= 0, isqrtVectorized(np.maximum(reach, 0)), -1)
+		# Rows where the walk is still out at x > 0
+		rows = np.nonzero(widest[:-1] > 0)[0]
+		stop = widest[rows]
+		start = np.maximum(np.minimum(stop, widest[rows + 1] + 1), 1)
+		counts = stop - start + 1
+		# Expand each row's [start, stop] span into individual cells
+		firstOfRow = np.repeat(np.cumsum(counts) - counts, counts)
+		QX = np.repeat(stop, counts) - (np.arange(counts.sum()) - firstOfRow)
+		QY = np.repeat(rows, counts)
+		# Rotate quadrant 1 into the other three
+		X = np.concatenate((QX, -QY, -QX, QY))
+		Y = np.concatenate((QY, QX, -QY, -QX))
+	else:
+		octantX = []
+		octantY = []
+		x = radius
+		y = 0
+		while x > 0 and x >= y:
+			octantX.append(x)
+			octantY.append(y)
+			# Candidates are west, north, and northwest (in ascending y terms)
+			# of the current cell; Take the one closest to the threshold,
+			# with ties going to the earlier candidate
+			deltaW = abs((x - 1) ** 2 + y ** 2 - threshold)
+			deltaN = abs(x ** 2 + (y + 1) ** 2 - threshold)
+			deltaNW = abs((x - 1) ** 2 + (y + 1) ** 2 - threshold)
+			if deltaW <= deltaN and deltaW <= deltaNW:
+				x -= 1
+			elif deltaN <= deltaNW:
+				y += 1
+			else:
+				x -= 1
+				y += 1
+
+		OX = np.array(octantX, int)
+		OY = np.array(octantY, int)
+		# Mirror across the diagonal, then into all four quadrants
+		X = np.concatenate((OX, OY, -OX, -OY, OX, OY, -OX, -OY))
+		Y = np.concatenate((OY, OX, OY, OX, -OY, -OX, -OY, -OX))
+
+	return np.unique(np.stack((X, Y), axis = 1), axis = 0)
+
+def buildCircleStencil(radius : int, charliesMethod : bool = True) -> dict:
+	"""
+	Rasterize the edge (ring) and fill (disc) of a circle centered in a
+	(2r + 1) by (2r + 1) frame; The arrays are read-only since they get shared
+	"""
+	edgeOffsets = getCircleEdgeOffsets(radius, charliesMethod)
+	d = 2 * radius + 1
+
+	edge = np.zeros((d, d), bool)
+	edge[edgeOffsets[:, 1] + radius, edgeOffsets[:, 0] + radius] = 1
+	# Every row of the disc spans from its westmost to its eastmost edge cell
+	# (which is exactly what flooding out from the center used to produce),
+	# so sweep the edge from both sides and keep what both sweeps reach
+	fill = np.logical_or.accumulate(edge, axis = 1) \
+		& np.logical_or.accumulate(edge[:, ::-1], axis = 1)[:, ::-1]
+	# 0 outside, 1 on the edge, 2 on the floor (inside of the edge),
+	# for indexing lookup tables with (see Circle.getLocalLabels)
+	regions = edge + 2 * (fill & ~edge).astype(np.uint8)
+
+	# Sort the edge cells by their bearing from the center for getAngledEdgeCell
+	# (outermost first when two cells share a bearing)
+	X = edgeOffsets[:, 0]
+	Y = edgeOffsets[:, 1]
+	azimuths = ((np.arctan2(Y, X) * 180. / np.pi) - 90.) % 360.
+	order = np.lexsort((-(X ** 2 + Y ** 2), azimuths))
+	azimuths = azimuths[order]
+	azimuthOffsets = edgeOffsets[order]
+
+	for A in (edgeOffsets, edge, fill, regions, azimuths, azimuthOffsets):
+		A.setflags(write = False)
+
+	return {
+		"edgeOffsets" : edgeOffsets, "edge" : edge, "fill" : fill,
+		"regions" : regions, "azimuths" : azimuths, "azimuthOffsets" : azimuthOffsets
+	}
+
+def getStencilBytes(stencil : dict) -> int:
+	"""Count the bytes held by the arrays of a stencil"""
+	return sum(A.nbytes for A in stencil.values() if isinstance(A, np.ndarray))
+
+class StencilCache:
+	"""
+	Process-wide cache of circle stencils keyed by radius
+	(and by which rasterization method was used), bounded by the bytes
+	their arrays hold; The least recently used stencil gets evicted first
+	"""
+	def __init__(self, maxBytes : int = 32 << 20):
+		"""
+		Needs a cap on how many bytes of stencils to hold at once
+		(the most recent stencil is always kept, even if it's bigger)
+		"""
+		self.maxBytes = maxBytes
+		self.stencils = OrderedDict()
+		self.sizes = {}
+		self.bytes = 0
+		self.hits = 0
+		self.misses = 0
+
+	def __str__(self) -> str:
+		"""String representation"""
+		return (
+			"A circle stencil cache holding {:d} stencils in {:d} of at most {:d} bytes, "
+			"with {:d} hits and {:d} misses."
+		).format(
+			len(self.stencils), self.bytes, self.maxBytes, self.hits, self.misses
+		)
+
+	def __repr__(self) -> str:
+		"""Generic representation (just uses __str__)"""
+		return self.__str__()
+
+	def __len__(self) -> int:
+		return len(self.stencils)
+
+	def get(self, radius : int, charliesMethod : bool = True) -> dict:
+		"""Look up a stencil, building (and possibly evicting) on a miss"""
+		key = (int(radius), bool(charliesMethod))
+
+		if key in self.stencils:
+			self.hits += 1
+			self.stencils.move_to_end(key)
+			return self.stencils[key]
+
+		self.misses += 1
+		stencil = buildCircleStencil(*key)
+		self.stencils[key] = stencil
+		self.sizes[key] = getStencilBytes(stencil)
+		self.bytes += self.sizes[key]
+
+		while self.bytes > self.maxBytes and len(self.stencils) > 1:
+			old, _ = self.stencils.popitem(last = False)
+			self.bytes -= self.sizes.pop(old)
+
+		return stencil
+
+	def prewarm(self, rMin : int, rMax : int, charliesMethod : bool = True):
+		"""Build the stencils for every radius from rMin to rMax (inclusive)"""
+		for r in range(max(rMin, 1), rMax + 1):
+			self.get(r, charliesMethod)
+
+	def getMemoryUsage(self) -> int:
+		"""Count the bytes held by the arrays of every cached stencil"""
+		return self.bytes
+
+	def getStats(self) -> dict:
+		"""Summarize the hits, misses, size, and memory usage of the cache"""
+		return {
+			"hits" : self.hits,
+			"misses" : self.misses,
+			"entries" : len(self.stencils),
+			"bytes" : self.bytes
+		}
+
+	def clear(self):
+		"""Drop every stencil and reset the counters"""
+		self.stencils.clear()
+		self.sizes.clear()
+		self.bytes = 0
+		self.hits = 0
+		self.misses = 0
+
+circleStencils = StencilCache()
+
 class Circle(Shape):
 	"""Numpy supporting circle class"""
 	def __init__(self, x : int, y : int, r : int):
 		"""Needs a coordinate and radius"""
 		self.origin = Point(x, y)
 		self.radius = abs(r)
-		self.edgeCells = {}
 		self.refreshEdgeCells()
 
 	def __str__(self):
@@ -371,64 +1096,42 @@ class Circle(Shape):
 		"""Generic representation (just uses __str__)"""
 		return self.__str__()
 	
+	def __getstate__(self) -> dict:
+		"""Leave the shared stencil out, it gets looked up again on load"""
+		state = self.__dict__.copy()
+		state.pop("stencil", None)
+		state.pop("edgeCellsCache", None)
+		return state
+
+	def __setstate__(self, state : dict):
+		"""
+		Always take the stencil back out of the cache, so that circles pickled
+		before stencils existed (or with older stencils) still work
+		"""
+		state.pop("edgeCells", None)
+		state.pop("stencil", None)
+		self.__dict__.update(state)
+		self.refreshEdgeCells(state.get("charliesMethod", True))
+
 	def refreshEdgeCells(self, charliesMethod : bool = True):
 		"""
-		Use a version of the midpoint circle algorithm to compute
-		the edge cells of the circle
-		"""
-		firstQuarter = []
-		p = Point(self.radius, 0) # Start at (r, 0)
-		# Build up from 0 to pi/2 radians in quadrant 1
-		while p.x > 0:
-			firstQuarter.append(p)
-			nextPoints = (
-				Point(p.x - 1, p.y),
-				Point(p.x, p.y + 1),
-				Point(p.x - 1, p.y + 1)
-			)
-			XY = np.stack(tuple(p.tupl for p in nextPoints)) # Vectorize next points
-			
-			if charliesMethod: # Filter out points that are too far out first
-				nextPointsWithinRange = []
-				for i in np.where(
-					XY[:, 0] ** 2 + XY[:, 1] ** 2 - (
-						self.radius ** 2 + int(self.radius ** 0.5)
-					) <= 0
-				)[0]:
-					nextPointsWithinRange.append(nextPoints[i])
-					
-				XYWithinRange = np.stack(tuple(p.tupl for p in nextPointsWithinRange))
-				# Take the farthest out point that passed the above filter
-				p = nextPointsWithinRange[
-					np.argmax(
-						XYWithinRange[:, 0] ** 2 + XYWithinRange[:, 1] ** 2
-					)
-				]
-			else: # Standard vectorized midpoint circle algorithm (I think?)
-				p = nextPoints[
-					np.argmin(
-						np.abs(
-							XY[:, 0] ** 2 + XY[:, 1] ** 2 - (
-								self.radius ** 2 + int(self.radius ** 0.5)
-							)
-						)
-					)
-				]
-		# Vectorize the quadrant 1 points then apply rotation matrices to them
-		fqA = np.array(tuple(p.tupl for p in firstQuarter), int).transpose()
-		sqR, tqR, rqR = (
-			np.array([[np.cos(t), -np.sin(t)], [np.sin(t), np.cos(t)]])
-			for t in (np.pi / 2, np.pi, 3 * np.pi / 2)
-		)
-		# After rotating, bring them back to ints and back to a list of lists
-		secondQuarter = (sqR @ fqA).round().astype(int).transpose().tolist()
-		thirdQuarter = (tqR @ fqA).round().astype(int).transpose().tolist()
-		fourthQuarter = (rqR @ fqA).round().astype(int).transpose().tolist()
-		# Apply a translation to all points
-		self.edgeCells = {p + self.origin for p in firstQuarter} \
-			| {Point(*p) + self.origin for p in secondQuarter} \
-			| {Point(*p) + self.origin for p in thirdQuarter} \
-			| {Point(*p) + self.origin for p in fourthQuarter}
+		Look up (or compute) the stencil for this radius,
+		which holds the edge cells of the circle relative to its center
+		"""
+		self.charliesMethod = charliesMethod
+		self.stencil = circleStencils.get(self.radius, charliesMethod)
+		self.edgeCellsCache = None
+
+	@property
+	def edgeCells(self) -> set:
+		"""The edge cells of the circle, translated out of the stencil on demand"""
+		if self.edgeCellsCache is None:
+			self.edgeCellsCache = {
+				Point(x + self.origin.x, y + self.origin.y)
+				for x, y in self.stencil["edgeOffsets"].tolist()
+			}
+
+		return self.edgeCellsCache
 	
 	def getMinFrame(self) -> Point:
 		"""Determine the minimum graphic frame for the circle"""
@@ -438,6 +1141,41 @@ class Circle(Shape):
 		"""Return the center cell of the cirlce"""
 		return self.origin
 
+	def getBounds(self) -> tuple:
+		"""Determine the bounding box of the circle"""
+		return (
+			self.origin.x - self.radius, self.origin.y - self.radius,
+			self.origin.x + self.radius + 1, self.origin.y + self.radius + 1
+		)
+
+	def getLocalMaskEdge(self) -> tuple:
+		"""
+		Get the circle's edge cropped to its bounding box, plus its offset
+		(Straight from the stencil cache, so it is read-only)
+		"""
+		nw = Point(self.origin.x - self.radius, self.origin.y - self.radius)
+		return self.stencil["edge"], nw
+
+	def getLocalMaskFill(self) -> tuple:
+		"""
+		Get the filled in circle cropped to its bounding box, plus its offset
+		(Straight from the stencil cache, so it is read-only)
+		"""
+		nw = Point(self.origin.x - self.radius, self.origin.y - self.radius)
+		return self.stencil["fill"], nw
+
+	def getLocalLabels(self, table : np.array) -> tuple:
+		"""
+		Get the circle cropped to its bounding box with every cell labelled
+		from a lookup table of (outside, edge, floor) values, plus its offset
+		"""
+		nw = Point(self.origin.x - self.radius, self.origin.y - self.radius)
+		return table[self.stencil["regions"]], nw
+
+	def stampEdge(self, M : np.array) -> np.array:
+		"""OR the circle's edge into an existing frame"""
+		return stampMask(M, *self.getLocalMaskEdge())
+
 	def getMaskEdge(self, fw : int = 0, fh : int = 0) -> np.array:
 		"""
 		Get a binary numpy mask array with the circle's edge only,
@@ -447,66 +1185,500 @@ class Circle(Shape):
 			f = self.getMinFrame()
 			fw = f.x
 			fh = f.y
-			
-		M = np.zeros((fh, fw), bool)
-		
-		for p in self.edgeCells:
-			M[p.y, p.x] = 1
-			
-		return M
+
+		return self.stampEdge(np.zeros((fh, fw), bool))
 
 	def getMaskFill(self, fw : int = 0, fh : int = 0) -> np.array:
 		"""
-		Use flood fill to get a binary numpy mask array with the circle filled in,
+		Get a binary numpy mask array with the circle filled in,
 		to arbitrary frame size
 		"""
-		M = self.getMaskEdge(fw, fh)
-		
-		queue = [self.origin]
-		while len(queue) > 0:
-			p = queue.pop()
-			if M[p.y, p.x] == 0:
-				M[p.y, p.x] = 1
-				queue.insert(0, Point(p.x, p.y - 1))
-				queue.insert(0, Point(p.x - 1, p.y))
-				queue.insert(0, Point(p.x, p.y + 1))
-				queue.insert(0, Point(p.x + 1, p.y))
-				
-		return M
+		if fw == 0 or fh == 0:
+			f = self.getMinFrame()
+			fw = f.x
+			fh = f.y
+
+		return self.stampFill(np.zeros((fh, fw), bool))
 
 	def getAngledEdgeCell(self, azimuth : float) -> Point:
-		"""Determine the best edge cell of this circle given a bearing"""
-		# Since we -90 deg to go from trig to azimuth, we undo that to go back
-		theta = (azimuth + 90.) % 360.
-
-		trigStuff = np.array([
-			np.sin(theta * np.pi / 180.),
-			np.cos(theta * np.pi / 180.)
-		])
-
-		estimate = self.origin + Point(
-			*( # Fuck you, we unpack iterables in my code!
-				(self.origin.npar * trigStuff).round().astype(int).tolist()[::-1]
-			)
+		"""
+		Determine the best edge cell of this circle given a bearing;
+		The stencil keeps its edge cells sorted by azimuth (see getAzimuth),
+		so this is a binary search for the cell with the closest bearing
+		"""
+		azimuths = self.stencil["azimuths"]
+		azimuth %= 360.
+		# The closest bearing is on one side or the other of where this one
+		# would be inserted, wrapping around past 360 (or 0) if need be
+		after = int(np.searchsorted(azimuths, azimuth)) % len(azimuths)
+		before = after - 1
+
+		if (azimuth - azimuths[before]) % 360. <= (azimuths[after] - azimuth) % 360.:
+			x, y = self.stencil["azimuthOffsets"][before]
+		else:
+			x, y = self.stencil["azimuthOffsets"][after]
+
+		return Point(self.origin.x + x, self.origin.y + y)
+
+	def getAngledEdgeCells(self, azimuths : np.array) -> np.array:
+		"""
+		Determine the best edge cells of this circle for many bearings at once,
+		as rows of (x, y); Same binary search as getAngledEdgeCell, vectorized
+		"""
+		table = self.stencil["azimuths"]
+		azimuths = np.asarray(azimuths, float) % 360.
+		after = np.searchsorted(table, azimuths) % len(table)
+		before = after - 1
+
+		pickBefore = (azimuths - table[before]) % 360. <= (table[after] - azimuths) % 360.
+		offsets = self.stencil["azimuthOffsets"][np.where(pickBefore, before, after)]
+
+		return offsets + self.origin.tupl
+
+class OccupancyMap:
+	"""
+	Running raster of every shape accepted so far, updated in place;
+	Candidates only get tested through their own bounding box
+	"""
+	def __init__(self, w : int, h : int, x : int = 0, y : int = 0):
+		"""Needs the frame size, and optionally where its northwest corner sits"""
+		self.origin = Point(x, y)
+		self.mask = np.zeros((h, w), bool)
+		self.count = 0
+
+	def __str__(self) -> str:
+		"""String representation"""
+		return "An occupancy map of {:d} shapes over a {:d}x{:d} frame at {}.".format(
+			self.count, self.mask.shape[1], self.mask.shape[0], self.origin
 		)
-		edgeArray = np.vstack([p.npar for p in self.edgeCells])
-
-		correct = np.count_nonzero(np.all(estimate.npar == edgeArray, axis = 1))
-
-		if not correct:
-			return Point(
-				*( # Unpack into individual parameters
-					edgeArray[
-						np.argmin( # Index of smallest total deviated cell
-							np.sum( # Total taxicab deviation per cell
-								np.abs( #Absolute deviation per axis
-									edgeArray - estimate.npar
-								), axis = 1
-							)
-						)
-					][::-1] # Reverse from (y, x) to (x, y)
+
+	def __repr__(self) -> str:
+		"""Generic representation (just uses __str__)"""
+		return self.__str__()
+
+	def __len__(self) -> int:
+		return self.count
+
+	def add(self, shape):
+		"""OR a shape's fill into the map"""
+		local, offset = shape.getLocalMaskFill()
+		stampMask(self.mask, local, offset - self.origin)
+		self.count += 1
+
+	def collides(self, shape) -> bool:
+		"""Determine if a shape's fill hits any occupied cell (inside of the frame)"""
+		local, offset = shape.getLocalMaskFill()
+		window = clipWindow(self.mask.shape, offset - self.origin, local.shape)
+		if window is None:
+			return False
+
+		return bool(np.any(self.mask[window[0]] & local[window[1]]))
+
+class ShapeSet:
+	"""
+	Base class for array-backed collections of shapes;
+	Works as a drop-in replacement for a list of shapes, while also keeping
+	the parameters of every shape in one contiguous numpy array
+	for vectorized queries
+	"""
+	columns = 0 # Subclass must set this!
+
+	def __init__(self, shapes : list = []):
+		"""Optionally, shapes to start the collection with"""
+		self.shapes = []
+		self.data = np.zeros((16, self.columns), int)
+
+		for s in shapes:
+			self.append(s)
+
+	def __str__(self) -> str:
+		"""String representation"""
+		return "A set of {:d} shapes: {}".format(len(self.shapes), self.shapes)
+
+	def __repr__(self) -> str:
+		"""Generic representation (just uses __str__)"""
+		return self.__str__()
+
+	def __len__(self) -> int:
+		return len(self.shapes)
+
+	def __iter__(self):
+		return iter(self.shapes)
+
+	def __getitem__(self, i):
+		return self.shapes[i]
+
+	def __contains__(self, shape) -> bool:
+		return shape in self.shapes
+
+	def __add__(self, other) -> list:
+		"""Concatenate like lists do"""
+		return self.shapes + list(other)
+
+	def getRow(self, shape) -> tuple:
+		"""Placeholder, subclass must implement!"""
+		return ()
+
+	def append(self, shape):
+		"""Add a shape to the end of the collection"""
+		n = len(self.shapes)
+		if n == self.data.shape[0]: # Grow geometrically, like lists do
+			self.data = np.vstack((self.data, np.zeros_like(self.data)))
+
+		self.data[n] = self.getRow(shape)
+		self.shapes.append(shape)
+
+	def extend(self, shapes : list):
+		"""Add many shapes to the end of the collection"""
+		for s in shapes:
+			self.append(s)
+
+	def clear(self):
+		"""Empty out the collection"""
+		self.shapes = []
+
+	def getBounds(self) -> np.array:
+		"""Placeholder, subclass must implement!"""
+		return np.zeros((0, 4), int)
+
+	def getCentroids(self) -> np.array:
+		"""Placeholder, subclass must implement!"""
+		return np.zeros((0, 2), int)
+
+	def getMinFrames(self) -> np.array:
+		"""Determine the minimum graphic frame of every shape, as rows of (x, y)"""
+		return self.getBounds()[:, 2:]
+
+	def getTaxicabDistances(self) -> np.array:
+		"""Compute the taxicab distances between the centroids of every pair"""
+		C = self.getCentroids()
+		return np.abs(C[:, np.newaxis, :] - C[np.newaxis, :, :]).sum(axis = 2)
+
+	def getCentroidGrid(self, C : np.array, perCell : int):
+		"""
+		Bucket centroids into a SpatialGrid with about perCell of them
+		to a grid cell (for the spread they have), so nearest neighbor
+		searches stay local
+		"""
+		extent = C.max(axis = 0) - C.min(axis = 0) + 1
+		cellSize = int(np.ceil(np.sqrt(np.prod(extent) * max(1, perCell) / len(C))))
+		grid = SpatialGrid(cellSize)
+		grid.insertPoints(C)
+		return grid
+
+	def searchGrid(
+		self, grid, C : np.array, i : int, k : int,
+		labels : np.array = None, bound : int = None
+	) -> tuple:
+		"""
+		Search the grid of centroids C outward from shape i, a ring of grid cells
+		at a time, for the k nearest other shapes (taxicab distance)
+		that don't share a label with it (if labels are given),
+		nearest first with ties going to the lower index; Gives back their
+		indices and distances. Anything past a ring is more than ring * cellSize
+		away, so the search stops once nothing unseen could be nearer,
+		or could be nearer than bound
+		"""
+		n = len(C)
+		key = (int(C[i, 0]) // grid.cellSize, int(C[i, 1]) // grid.cellSize)
+		found = []
+		seen = 1 # Shape i itself
+		r = 0
+		while seen < n:
+			J = np.array(grid.queryIndices(grid.getRingKeys(key, r)), int)
+			J = J[J != i]
+			seen += len(J)
+			if labels is not None:
+				J = J[labels[J] != labels[i]]
+			found.append(J)
+
+			reach = r * grid.cellSize # Anything unseen is further than this
+			if bound is not None and reach >= bound:
+				break
+			count = sum(len(f) for f in found)
+			if count >= k:
+				D = np.abs(C[np.concatenate(found)] - C[i]).sum(axis = 1)
+				if np.partition(D, k - 1)[k - 1] <= reach:
+					break
+			r += 1
+
+		found = np.concatenate([np.zeros(0, int)] + found)
+		D = np.abs(C[found] - C[i]).sum(axis = 1)
+		order = np.lexsort((found, D))[:k]
+		return found[order], D[order]
+
+	def getNearestIndices(self, k : int) -> np.array:
+		"""
+		Find the k nearest other shapes to every shape (taxicab distance between
+		centroids), as rows of indices sorted nearest first with ties going
+		to the lower index; The centroids get bucketed into a grid,
+		so each shape only searches the grid cells around it
+		"""
+		n = len(self.shapes)
+		k = max(0, min(k, n - 1))
+		nearest = np.zeros((n, k), int)
+		if k == 0:
+			return nearest
+
+		C = self.getCentroids()
+		grid = self.getCentroidGrid(C, k)
+		for i in range(n):
+			nearest[i] = self.searchGrid(grid, C, i, k)[0]
+
+		return nearest
+
+	def getConnectingPairs(self, extra : float = 0., k : int = 8) -> np.array:
+		"""
+		Plan pairs of shapes to connect so that every shape is reachable,
+		as rows of indices (i, j); A minimum spanning tree (taxicab distance
+		between centroids) is built over each shape's k nearest neighbors,
+		then the shortest leftover edges get added on top, as a fraction
+		of the tree's size
+		"""
+		n = len(self.shapes)
+		if n < 2:
+			return np.zeros((0, 2), int)
+
+		C = self.getCentroids()
+		weigh = lambda I, J : np.abs(C[I] - C[J]).sum(axis = 1)
+		# Candidate edges from the neighbor graph, deduplicated as i < j
+		nearest = self.getNearestIndices(k)
+		I = np.repeat(np.arange(n), nearest.shape[1])
+		J = nearest.ravel()
+		E = np.unique(np.column_stack((np.minimum(I, J), np.maximum(I, J))), axis = 0)
+		W = weigh(E[:, 0], E[:, 1])
+		E = E[np.lexsort((E[:, 1], E[:, 0], W))]
+		# Kruskal's algorithm, over a union-find forest
+		parents = list(range(n))
+		def find(a : int) -> int:
+			while parents[a] != a:
+				parents[a] = parents[parents[a]] # Path halving
+				a = parents[a]
+			return a
+
+		tree = []
+		leftover = []
+		for i, j in E:
+			a, b = find(i), find(j)
+			if a == b:
+				leftover.append((i, j))
+			else:
+				parents[a] = b
+				tree.append((i, j))
+		# The neighbor graph might have been split into clumps, so each round
+		# every clump gets bridged to its closest outsider, found by searching
+		# the grid outward from each of its shapes (at least halving the clumps)
+		grid = None
+		while len(tree) < n - 1:
+			if grid is None:
+				grid = self.getCentroidGrid(C, k)
+			roots = np.array([find(a) for a in range(n)])
+			bridges = {}
+			for i in range(n):
+				best = bridges.get(roots[i])
+				J, D = self.searchGrid(
+					grid, C, i, 1, roots, None if best is None else best[0]
 				)
-			)
+				if len(J) == 0:
+					continue
+				bridge = (int(D[0]),) + tuple(sorted((i, int(J[0]))))
+				if best is None or bridge < best:
+					bridges[roots[i]] = bridge
+
+			for _, i, j in sorted(set(bridges.values())):
+				a, b = find(i), find(j)
+				if a != b:
+					parents[a] = b
+					tree.append((i, j))
+		# Leftovers are already sorted shortest first
+		extraCount = min(len(leftover), int(round(extra * (n - 1))))
+
+		return np.array(tree + leftover[:extraCount], int).reshape(-1, 2)
+
+	def getIntersectingIndices(self, bounds : tuple) -> np.array:
+		"""Find which shapes have bounding boxes intersecting a bounding box"""
+		B = self.getBounds()
+		return np.nonzero(
+			(np.maximum(B[:, 0], bounds[0]) < np.minimum(B[:, 2], bounds[2]))
+			& (np.maximum(B[:, 1], bounds[1]) < np.minimum(B[:, 3], bounds[3]))
+		)[0]
+
+	def overlapsAny(self, shape) -> bool:
+		"""
+		Determine if a shape overlaps any shape in the collection;
+		Bounding boxes are checked all at once, and then only the shapes
+		that survive get the exact test
+		"""
+		return any(
+			shape.overlaps(self.shapes[i])
+			for i in self.getIntersectingIndices(shape.getBounds())
+		)
+
+class RectangleSet(ShapeSet):
+	"""Array-backed collection of rectangles, stored as (x, y, w, h) rows"""
+	columns = 4
+
+	def getRow(self, shape) -> tuple:
+		return (shape.origin.x, shape.origin.y, shape.width, shape.height)
+
+	@property
+	def origins(self) -> np.array:
+		return self.data[:len(self.shapes), :2]
+
+	@property
+	def sizes(self) -> np.array:
+		return self.data[:len(self.shapes), 2:]
+
+	def getBounds(self) -> np.array:
+		"""Determine the bounding box of every rectangle, as rows of (x0, y0, x1, y1)"""
+		return np.hstack((self.origins, self.origins + self.sizes))
+
+	def getCentroids(self) -> np.array:
+		"""Determine the center cell of every rectangle, as rows of (x, y)"""
+		return self.origins + self.sizes // 2
+
+	def getBoxes(self) -> np.array:
+		"""Get every rectangle as rows of (x0, y0, x1, y1), for rasterizeBoxes"""
+		return self.getBounds()
+
+	def overlapsAny(self, shape) -> bool:
+		"""
+		Determine if a shape overlaps any rectangle in the collection;
+		For rectangles and lines, intersecting bounding boxes is enough
+		"""
+		if isinstance(shape, (Rectangle, Line)):
+			return len(self.getIntersectingIndices(shape.getBounds())) > 0
+
+		return ShapeSet.overlapsAny(self, shape)
+
+class CircleSet(ShapeSet):
+	"""Array-backed collection of circles, stored as (x, y, r) rows"""
+	columns = 3
+
+	def getRow(self, shape) -> tuple:
+		return (shape.origin.x, shape.origin.y, shape.radius)
+
+	@property
+	def origins(self) -> np.array:
+		return self.data[:len(self.shapes), :2]
+
+	@property
+	def radii(self) -> np.array:
+		return self.data[:len(self.shapes), 2]
+
+	def getBounds(self) -> np.array:
+		"""Determine the bounding box of every circle, as rows of (x0, y0, x1, y1)"""
+		R = self.radii[:, np.newaxis]
+		return np.hstack((self.origins - R, self.origins + R + 1))
+
+	def getCentroids(self) -> np.array:
+		"""Determine the center cell of every circle, as rows of (x, y)"""
+		return self.origins
+
+	def overlapsAny(self, shape) -> bool:
+		"""
+		Determine if a shape overlaps any circle in the collection;
+		Circles get the same closed form tests as Shape.overlaps, vectorized,
+		so that only circles near the rim of the candidate get rasterized
+		"""
+		if not isinstance(shape, Circle):
+			return ShapeSet.overlapsAny(self, shape)
+
+		D2 = ((self.origins - shape.origin.tupl) ** 2).sum(axis = 1)
+		R = self.radii
+		if np.any(D2 <= np.maximum(R, shape.radius) ** 2):
+			return True
+
+		return any(
+			shape.overlaps(self.shapes[i])
+			for i in np.nonzero(D2 <= (R + shape.radius + 2) ** 2)[0]
+		)
+
+class SpatialGrid:
+	"""
+	Uniform grid spatial hash of shapes; Each shape is registered in every
+	grid cell its bounding box touches, so a query only has to look at
+	the shapes sharing grid cells with the candidate
+	"""
+	def __init__(self, cellSize : int):
+		"""Needs the side length of each grid cell (ideally about one shape wide)"""
+		self.cellSize = max(1, int(cellSize))
+		self.cells = {}
+		self.shapes = []
+
+	def __str__(self) -> str:
+		"""String representation"""
+		return "A spatial grid of {:d} shapes across {:d} cells of size {:d}.".format(
+			len(self.shapes), len(self.cells), self.cellSize
+		)
+
+	def __repr__(self) -> str:
+		"""Generic representation (just uses __str__)"""
+		return self.__str__()
+
+	def __len__(self) -> int:
+		return len(self.shapes)
+
+	def getCellKeys(self, bounds : tuple) -> list:
+		"""Determine which grid cells a bounding box touches"""
+		x0, y0, x1, y1 = bounds
+		if x0 >= x1 or y0 >= y1: # Empty boxes don't touch anything
+			return []
+
+		return [
+			(cx, cy)
+			for cy in range(y0 // self.cellSize, (y1 - 1) // self.cellSize + 1)
+			for cx in range(x0 // self.cellSize, (x1 - 1) // self.cellSize + 1)
+		]
+
+	def insert(self, shape):
+		"""Register a shape in every grid cell it touches"""
+		i = len(self.shapes)
+		self.shapes.append(shape)
+
+		for key in self.getCellKeys(shape.getBounds()):
+			if key in self.cells:
+				self.cells[key].append(i)
+			else:
+				self.cells[key] = [i]
+
+	def insertPoints(self, points : np.array):
+		"""
+		Register points (rows of (x, y)) in the one grid cell each falls in,
+		for nearest neighbor searches; They're found by index, like shapes
+		"""
+		for x, y in points.tolist():
+			i = len(self.shapes)
+			self.shapes.append((x, y))
+			key = (x // self.cellSize, y // self.cellSize)
+			if key in self.cells:
+				self.cells[key].append(i)
+			else:
+				self.cells[key] = [i]
+
+	def getRingKeys(self, key : tuple, r : int) -> list:
+		"""Determine which grid cells are exactly r cells away from a grid cell"""
+		cx, cy = key
+		if r == 0:
+			return [key]
+
+		return [(x, cy - r) for x in range(cx - r, cx + r + 1)] \
+			+ [(x, cy + r) for x in range(cx - r, cx + r + 1)] \
+			+ [(cx - r, y) for y in range(cy - r + 1, cy + r)] \
+			+ [(cx + r, y) for y in range(cy - r + 1, cy + r)]
+
+	def queryIndices(self, keys : list) -> list:
+		"""Get the indices of everything registered in any of some grid cells"""
+		found = set()
+		for key in keys:
+			found.update(self.cells.get(key, ()))
+
+		return sorted(found)
 
-		return estimate
+	def query(self, bounds : tuple) -> list:
+		"""Get the shapes sharing at least one grid cell with a bounding box"""
+		return [self.shapes[i] for i in self.queryIndices(self.getCellKeys(bounds))]
 
+	def overlapsAny(self, shape) -> bool:
+		"""Determine if a shape overlaps any registered shape"""
+		return any(shape.overlaps(s) for s in self.query(shape.getBounds()))
@@ -1,5 +1,7 @@
 from ccDGLevels import Catacombs, Caves, City
 from ccDGLevels import np, Point, Rectangle, Line, Circle
+from ccDGLevels import getSeedSequence, getChildStream, PackedMask
+from ccDGLevels import rendererStreamDomain
 import cv2 as cv
 from os.path import exists as fileExists
 import json
@@ -41,14 +43,16 @@ class Renderer:
 	def __init__(
 		self, dungeon, tileInfo : dict,
 		tileResX : int, tileResY : int = 0,
-		alphaChannel : bool = False
+		alphaChannel : bool = False, seed : int = None
 	):
 		"""
 		Requires a constructed dungeon, a tile information dictionary,
 		and a resolution size of each tile.
 
 		Optionally, non-square tiles can be specified with a Y-resolution,
-		and it can be specified if an alpha channel should be used.
+		it can be specified if an alpha channel should be used,
+		and a seed (or numpy Generator) for picking tile variants can be given
+		(otherwise, they come from the dungeon's own seed).
 		"""
 		if tileResY == 0: # Square tiles
 			self.scale = Point(tileResX, tileResX)
@@ -65,13 +69,22 @@ class Renderer:
 		# To preview this properly, you need to reverse the third axis (see below)
 		self.image = np.zeros((self.size.y, self.size.x, self.channels), np.uint8)
 
-		self.masks = dungeon.getImageData()
+		# Packed layer masks only get unpacked here, right before painting
+		self.masks = {
+			key : np.asarray(value) if isinstance(value, PackedMask) else value
+			for key, value in dungeon.getImageData().items()
+		}
 		self.dungeonSize = dungeon.size
 		self.dungeonType = self.masks["dungeonType"]
 
 		self.tileInfo = tileInfo
 		self.loadTiles()
 
+		if seed is None and hasattr(dungeon, "seedSequence"):
+			self.seedSequence = dungeon.seedSequence
+		else:
+			self.seedSequence = getSeedSequence(seed)
+
 	def loadTiles(self, tileInfo : dict = {}):
 		"""
 		Use the existing tileInfo, or new tileInfo,
@@ -142,11 +155,25 @@ class Renderer:
 			print(self.tileInfo)
 			self.tiles = {}
 
-	def render(self, reset : bool = False):
-		"""Use the masks to paint the tiles on one layer at a time"""
+	def getVariantStream(self) -> np.random.Generator:
+		"""
+		Start the tile variant stream from the top, under a domain of the seed
+		that no level ever draws from (so it never matches any of their streams)
+		"""
+		return getChildStream(self.seedSequence, rendererStreamDomain, 0)
+
+	def render(self, reset : bool = False, seed : int = None):
+		"""
+		Use the masks to paint the tiles on one layer at a time;
+		Optionally, reseed which tile variants get picked
+		"""
 		if reset: # Clear out old rendering work
 			self.image = np.zeros((self.size.y, self.size.x, self.channels), np.uint8)
 
+		if seed is not None:
+			self.seedSequence = getSeedSequence(seed)
+		rng = self.getVariantStream()
+
 		if self.dungeonType == "catacombs":
 			paintOrder = catacombsTileKeys
 		elif self.dungeonType == "caves":
@@ -158,7 +185,7 @@ class Renderer:
 
 		for layer in paintOrder:
 			# Decide randomly which tile variants will appear where
-			variantizer = np.random.uniform(size = self.dungeonSize.npar)
+			variantizer = rng.uniform(size = self.dungeonSize.npar)
 			# Do you want this typed out in full two more times? Me neither
 			probs = self.tiles[layer]["probabilities"]
 
@@ -1,10 +1,13 @@
-from ccDGGeom import np, Point, Rectangle, Line, Circle
+from ccDGGeom import np, Point, Rectangle, Line, Band, Circle, stampMask
+from ccDGGeom import RectangleSet, CircleSet, SpatialGrid, OccupancyMap
+from ccDGGeom import rasterizeBoxes, collectBoxes, PackedMask
 from ccDocMaker import getDocStringWithArgs
 
 def maskToString(mask : np.array) -> str:
 	"""
 	Convert a 2D boolean array into a string using unicode block element characters
 	"""
+	mask = np.asarray(mask) # Unpacks packed masks
 	if mask.shape[0] % 2 != 0:
 		mask = np.vstack((mask, np.zeros(mask.shape[1], bool)))
 
@@ -18,8 +21,55 @@ def maskToString(mask : np.array) -> str:
 
 	return s
 
+def getSeedSequence(seed = None) -> np.random.SeedSequence:
+	"""
+	Turn a seed (None for fresh entropy, an int, a SeedSequence,
+	or a numpy Generator to draw one from) into a SeedSequence
+	"""
+	if isinstance(seed, np.random.SeedSequence):
+		return seed
+	if isinstance(seed, np.random.Generator):
+		seed = seed.integers(0, 2 ** 63, 4).tolist()
+
+	return np.random.SeedSequence(seed)
+
+# The first part of every child spawn key says who it's for,
+# so levels, renderers, and worlds never draw from the same stream
+levelStreamDomain = 0
+rendererStreamDomain = 1
+chunkSeedDomain = 2
+edgeSeedDomain = 3
+
+def getChildSeed(seedSequence : np.random.SeedSequence, *key) -> np.random.SeedSequence:
+	"""
+	Get the child of a seed under a spawn key (a domain, then any non-negative ints);
+	Unlike spawn, this doesn't advance the seed, so the same child can be made again
+	"""
+	return np.random.SeedSequence(
+		seedSequence.entropy, spawn_key = seedSequence.spawn_key + key,
+		pool_size = seedSequence.pool_size
+	)
+
+def getChildStream(seedSequence : np.random.SeedSequence, *key) -> np.random.Generator:
+	"""Start the stream of a seed's child (see getChildSeed) from the top"""
+	return np.random.Generator(np.random.PCG64(getChildSeed(seedSequence, *key)))
+
+def getParams(localVars : dict) -> dict:
+	"""
+	Pick a constructor's arguments out of its locals (so call this first thing),
+	minus the seed, to tell apart levels in a cache
+	"""
+	return {k : v for k, v in localVars.items() if k not in ("self", "seed")}
+
 # Abstract Class
 class Level:
+	# Phases of generation, each drawing from its own child stream of the seed
+	streamPhases = ()
+	# Everything generation produces, which gets saved to and loaded from caches
+	cachedAttributes = ()
+	# Whether the layer masks are kept bit-packed
+	packedLayers = False
+
 	def __init__(self):
 		raise NotImplementedError(
 			"Please implement a subclass of Level to construct an instance object."
@@ -33,6 +83,21 @@ class Level:
 	def __repr__(self):
 		return self.__str__()
 
+	def __getattr__(self, name : str):
+		"""
+		Levels loaded from an archive read in each generated attribute
+		the first time it gets accessed; It's a plain attribute afterwards
+		"""
+		archive = self.__dict__.get("archive")
+		if archive is None or name not in archive.meta["attributes"]:
+			raise AttributeError(
+				"'{}' object has no attribute '{}'".format(type(self).__name__, name)
+			)
+
+		value = archive.loadAttribute(name)
+		setattr(self, name, value)
+		return value
+
 	def gen(self, showProgress : bool = False):
 		raise NotImplementedError(
 			"Please implement a subclass of Level to generate a dungeon,\n"
@@ -51,15 +116,186 @@ class Level:
 			"of a dungeon"
 		)
 
-class Catacombs:
+	def drawLayers(self) -> tuple:
+		raise NotImplementedError(
+			"Please implement a subclass of Level to rasterize the base layer masks "
+			"of a dungeon"
+		)
+
+	def getLayers(self) -> tuple:
+		"""
+		Get the base layer masks, only rasterizing them if the dungeon has
+		been (re)generated since the last time; They are shared, so read-only
+		"""
+		if getattr(self, "layerCache", None) is None:
+			self.layerCache = self.drawLayers()
+			if self.packedLayers:
+				self.layerCache = self.packLayers(self.layerCache)
+
+			for layer in self.layerCache:
+				layer.flags.writeable = False
+
+		return self.layerCache
+
+	def packLayers(self, layers : tuple) -> tuple:
+		"""Bit-pack the base layer masks"""
+		return tuple(PackedMask(layer) for layer in layers)
+
+	def usePackedLayers(self, packed : bool = True):
+		"""
+		Keep the layer masks bit-packed (or not), in which case draw gives back
+		packed masks too (and tuples of them instead of 3D arrays);
+		They unpack with np.asarray, which the renderer does on its own
+		"""
+		self.packedLayers = packed
+		self.layerCache = None
+
+	def stackLayers(self, layers : tuple):
+		"""Stack masks up into a 3D array, unless they're packed"""
+		if isinstance(layers[0], PackedMask):
+			return tuple(layers)
+
+		return np.array(layers)
+
+	def invalidateLayers(self):
+		"""
+		Forget the cached layer masks; The gen methods do this on their own,
+		but call it after editing any shapes by hand
+		"""
+		self.layerCache = None
+		self.cacheKey = None # The shapes no longer match any cache entry
+
+	def setSeed(self, seed = None):
+		"""
+		(Re)seed the dungeon, with None for fresh entropy, an int, a SeedSequence,
+		or a numpy Generator; The same parameters and seed give the same dungeon
+		"""
+		self.seedSequence = getSeedSequence(seed)
+		# How many times each phase has been generated since (re)seeding
+		self.streamCounts = {phase : 0 for phase in self.streamPhases}
+		self.streams = {
+			phase : getChildStream(self.seedSequence, levelStreamDomain, k, 0)
+			for k, phase in enumerate(self.streamPhases)
+		}
+
+	def nextStream(self, phase : str) -> np.random.Generator:
+		"""
+		Move a phase on to its next stream; The first generation after (re)seeding
+		always gets the same one, so the same parameters and seed give the same
+		dungeon, while generating a phase again rolls a new one
+		"""
+		n = self.streamCounts[phase]
+		self.streamCounts[phase] = n + 1
+		self.streams[phase] = getChildStream(
+			self.seedSequence, levelStreamDomain, self.streamPhases.index(phase), n
+		)
+		return self.streams[phase]
+
+	def useCache(self, cache = None):
+		"""Look up and store generated dungeons in a LevelCache, or stop with None"""
+		self.cache = cache
+
+	def getCacheKey(self, phase : str, args : tuple = (), fresh : bool = True) -> str:
+		"""
+		Get the cache key of a phase of generation, or None if there's no cache;
+		Phases that aren't fresh build on the current shapes, so they can only
+		be cached if those shapes came from the cache key they're keyed on
+		"""
+		if getattr(self, "cache", None) is None:
+			return None
+		if fresh:
+			return self.cache.getKey(self, phase, args)
+
+		prior = getattr(self, "cacheKey", None)
+		if prior is None:
+			return None
+
+		return self.cache.getKey(self, phase, args, prior)
+
+	def loadCachedState(self, key : str) -> bool:
+		"""Restore the generated shapes and layer masks, if they're cached"""
+		if key is None:
+			return False
+
+		state = self.cache.load(key)
+		if state is None:
+			return False
+
+		for name, value in state.items():
+			setattr(self, name, value)
+		# The layers were stored packed or not, which may not match now
+		if isinstance(self.layerCache[0], PackedMask) != self.packedLayers:
+			self.layerCache = None
+		else:
+			for layer in self.layerCache:
+				layer.flags.writeable = False
+
+		self.cacheKey = key
+		return True
+
+	def storeCachedState(self, key : str):
+		"""Save the generated shapes and layer masks, if there's a cache"""
+		if key is None:
+			return
+
+		state = {name : getattr(self, name) for name in self.cachedAttributes}
+		state["streams"] = self.streams # Carry on generating from the same spot
+		state["streamCounts"] = dict(self.streamCounts)
+		state["layerCache"] = tuple(self.getLayers())
+		self.cache.store(key, state)
+		self.cacheKey = key
+
+	def getImageLayers(self) -> tuple:
+		"""Draw the image layer masks, or get them from the cache along with the shapes"""
+		key = self.getCacheKey("image", (self.packedLayers,), False)
+		layers = None if key is None else self.cache.load(key)
+		if layers is None:
+			layers = self.draw("IMAGE")
+			if key is not None:
+				self.cache.store(key, layers)
+
+		return layers
+
+	def genConnectors(self, connectors : dict, lines : dict):
+		raise NotImplementedError(
+			"Please implement a subclass of Level to connect a generated dungeon\n"
+			"to its neighbors in a World."
+		)
+
+	def getEdgeCell(self, side : str, position : int) -> tuple:
+		"""
+		Get the cell a connector sits on, some position along an edge of the frame
+		(n, e, s, or w), along with the (x, y) step that heads into the frame
+		"""
+		w, h = self.size.x, self.size.y
+		return {
+			'n' : (Point(position, 0), (0, 1)),
+			'e' : (Point(w - 1, position), (-1, 0)),
+			's' : (Point(position, h - 1), (0, -1)),
+			'w' : (Point(0, position), (1, 0))
+		}[side]
+
+	def getNearestRoom(self, cell : Point) -> int:
+		"""Index of the room with the centroid nearest a cell by taxicab distance, or -1"""
+		if len(self.rooms) == 0:
+			return -1
+
+		return int(np.argmin(np.abs(self.rooms.getCentroids() - cell.npar[::-1]).sum(axis = 1)))
+
+class Catacombs(Level):
 	"""Nethack style dungeon"""
+	streamPhases = ("rooms", "halls")
+	cachedAttributes = ("rooms", "halls", "hallCounts")
+
 	def __init__(
 		self, w : int, h : int,
 		rct : int, raap : float,
 		varix : int, variy : int,
 		conn : int, doShift : bool,
 		padx : int = 0, pady : int = 0,
-		thick : int = 1, varih : int = 0
+		thick : int = 1, varih : int = 0,
+		graph : bool = False, extra : float = 0.,
+		seed : int = None
 	):
 		"""Fill out via DocMaker"""
 # Original manual docstring
@@ -80,6 +316,9 @@ class Catacombs:
 #  9.  pady    : int = 0 : minimum vertical space between rooms    : .padding.y
 #  10. thick   : int = 1 : width of hallways                       : .hallThickness
 #  11. varih   : int = 0 : absolute deviation of hallway thickness : .varianceHall
+#  12. graph   : bool = False : connect rooms along a spanning tree : .hallGraph
+#  13. extra   : float = 0.   : extra hallways per tree hallway     : .hallExtraFraction
+#  14. seed    : int = None   : seed (or numpy Generator) to draw from : .seedSequence
 
 		#Requires a width & height in cells, a room count, an average area per room
 		#expressed as a percentage (0.0 -> 1.0), absolute deviations in room size
@@ -87,9 +326,13 @@ class Catacombs:
 		#at minimum, and whether to shift the midpoint of hallways or not.
 		
 		#Optionally, padding widths in the x and y directions,
-		#a hallway thickness, and an absolute deviation in hallway thickness
-		#can be specified.
+		#a hallway thickness, an absolute deviation in hallway thickness,
+		#whether to plan hallways as a spanning tree over the rooms instead
+		#of by connection count, and what fraction of extra short hallways
+		#to add on top of that tree, and a seed (or numpy Generator) to make
+		#the dungeon reproducible can be specified.
 		
+		self.params = getParams(locals())
 		self.size = Point(w, h)
 		self.roomCount = rct
 		self.roomAvgAreaPercent = raap
@@ -103,8 +346,11 @@ class Catacombs:
 		self.doHallShifting = doShift
 		self.hallThickness = thick
 		self.varianceHall = varih
+		self.hallGraph = graph
+		self.hallExtraFraction = extra
+		self.setSeed(seed)
 		# Store the rooms and halls in these lists, must generate them separately
-		self.rooms = []
+		self.rooms = RectangleSet()
 		self.halls = []
 		self.hallCounts = []
 
@@ -118,13 +364,17 @@ class Catacombs:
 			"shift hallway connection bisector from middle",
 			"minimum horizontal space between rooms",
 			"minimum vertical space between rooms",
-			"width of hallways", "absolute deviation of hallway width"
+			"width of hallways", "absolute deviation of hallway width",
+			"connect rooms along a spanning tree instead",
+			"fraction of extra hallways on top of the tree",
+			"seed (or numpy Generator) to draw from"
 		],
 		4, True,
 		[ # Class Member Names
 			".size.x", ".size.y", ".roomCount", ".roomAvgAreaPercent",
 			".variance.x", ".variance.y", ".hallAvgCount", ".doHallShifting",
-			".padding.x", ".padding.y", ".hallThickness", ".varianceHall"
+			".padding.x", ".padding.y", ".hallThickness", ".varianceHall",
+			".hallGraph", ".hallExtraFraction", ".seedSequence"
 		]
 	)
 	
@@ -154,8 +404,10 @@ class Catacombs:
 		"""Randomly generate rooms"""
 		if not reset:
 			return
+		self.invalidateLayers()
+		rng = self.nextStream("rooms")
 		# Clear old rooms and halls
-		self.rooms = []
+		self.rooms = RectangleSet()
 		self.halls = []
 		self.hallCounts = [0 for i in range(len(self.rooms))]
 		# Cap how many times rectangles are generated
@@ -173,10 +425,16 @@ class Catacombs:
 					)
 				)
 			) # Allows for more filled dungeons to have more attempts
+		# Placed rooms get bucketed into a grid of about room sized cells,
+		# so each candidate only gets checked against its neighbors
+		grid = SpatialGrid(
+			max(self.roomAvgDim.x + self.variance.x, self.roomAvgDim.y + self.variance.y)
+			+ 2 * max(self.padding.x, self.padding.y)
+		)
 		# Try to generate valid rooms
 		while len(self.rooms) < self.roomCount:
 			attempts += 1
-			noise = np.random.randint(
+			noise = rng.integers(
 				-self.variance.npar[::-1], self.variance.npar[::-1] + 1, 2
 			)
 			newSize = Point(*np.maximum(
@@ -184,7 +442,7 @@ class Catacombs:
 				np.zeros(2, int) + 4
 			))
 			originSpace = self.size - newSize # Cannot place an origin beyond this point
-			newOrigin = Point(*np.random.randint(np.zeros(2, int), originSpace.tupl, 2))
+			newOrigin = Point(*rng.integers(np.zeros(2, int), originSpace.tupl, 2))
 			newRoom = Rectangle(newOrigin.x, newOrigin.y, newSize.x, newSize.y)
 			newRoomPadZone = Rectangle(
 				max(newOrigin.x - self.padding.x, 0),
@@ -192,15 +450,10 @@ class Catacombs:
 				newSize.x + 2 * self.padding.x,
 				newSize.y + 2 * self.padding.y
 			) # Use this rectangle to enforce padding
-			# Check that there are no overlaps
-			nonOverlapping = True
-			for r in self.rooms:
-				if newRoomPadZone & r:
-					nonOverlapping = False
-					break
 			# Only accept non-overlapping rooms
-			if nonOverlapping:
+			if not grid.overlapsAny(newRoomPadZone):
 				self.rooms.append(newRoom)
+				grid.insert(newRoom)
 				print(noise, newSize, newOrigin)
 				print(newRoom)
 				print(newRoomPadZone)
@@ -214,241 +467,289 @@ class Catacombs:
 
 		print("Attempted room generations", attempts, "times.")
 
+	def genHall(self, i : int, j : int):
+		"""Generate a hallway between two rooms (by index)"""
+		self.invalidateLayers()
+		rng = self.streams["halls"]
+		room = self.rooms[i]
+		other = self.rooms[j]
+		# Tuple unpacking
+		wallOrient, wallCells = room.getNearestWall(other)
+		wallOtherOrient, wallOtherCells = other.getNearestWall(room)
+
+		#print(i, j, room.getAzimuth(other), wallOrient, len(wallCells))
+		# Decide the doorways' locations
+		startRoom = list(wallCells)[
+			rng.integers(0, len(wallCells))
+		]
+		startOther = list(wallOtherCells)[
+			rng.integers(0, len(wallOtherCells))
+		]
+		# Get the distance delta along both axes
+		delta = startRoom - startOther
+		dx = abs(delta.x)
+		dy = abs(delta.y)
+
+		#print(startRoom, startOther, dx, dy)
+		# Orientation booleans
+		goingVertical = wallOrient in ('n', 's')
+		goingVerticalOther = wallOtherOrient in ('n', 's')
+		# Produce an S-hall or an L-hall
+		if goingVertical and goingVerticalOther \
+			or not goingVertical and not goingVerticalOther:
+			# Randomly shift the meeting point of the hallways
+			if self.doHallShifting:
+				shiftRange = self.padding.x // 2 if not goingVertical \
+				else self.padding.y // 2
+				shiftRange -= self.hallThickness // 2
+				shiftRange = max(0, shiftRange)
+				shift = rng.integers(-shiftRange, shiftRange + 1)
+				#print(shiftRange, shift)
+			else:
+				shift = 0
+			# Compute the initial hallway segments
+			roomHall = Line(
+				startRoom.x, startRoom.y,
+				dx // 2 + 1 + dx % 2 + shift if not goingVertical
+				else dy // 2 + 1 + dy % 2 + shift,
+				wallOrient
+			)
+			otherHall = Line(
+				startOther.x, startOther.y,
+				dx // 2 + 1 - shift if not goingVerticalOther
+				else dy // 2 + 1 - shift,
+				wallOtherOrient
+			)
+			# Determine the orientation of the connecting hallway segment
+			# (It comes out from the segment attached to the starting room)
+			connectingOrientation, connectingVector = roomHall.getNearestOrientation(
+				otherHall, mode = 'e'
+			)
+			connectingHall = Line(
+				roomHall.getEndpoint().x, roomHall.getEndpoint().y,
+				dx + 1 if goingVertical else dy + 1,
+				connectingOrientation
+			)
+			# The other segments will be added at the bottom of the loop
+			self.halls.append(connectingHall)
+			# Make sure the staricase formation of the padded halls faces the right way
+			offsetCorrect = -1 if (
+				goingVertical and startRoom.x < startOther.x
+				or not goingVertical and startRoom.y < startOther.y
+			) else 1
+
+			# Make sure the padding lines don't intersect the wall
+			# (Keep doorways to 1 cell wide)
+			offsetWall = -1 if (
+				wallOrient == 'n' or wallOrient == 'w'
+			) else 1
+			offsetWallOther = -1 if (
+				wallOtherOrient == 'n' or wallOtherOrient == 'w'
+			) else 1
+			# Randomly vary the amount of padding lines
+			hallNoise = rng.integers(-self.varianceHall, self.varianceHall + 1)
+			thickness = self.hallThickness - 1 + hallNoise
+			# Generate the padding lines as bands, each line sitting at
+			# the offsets 1, -1, 2, -2, 3, -3, ... from the middle,
+			# and growing (or shrinking) by a step per offset
+			lengthRoom = dx // 2 + dx % 2 + shift if not goingVertical \
+				else dy // 2 + dy % 2 + shift
+			lengthOther = dx // 2 - shift if not goingVerticalOther \
+				else dy // 2 - shift
+
+			thickRoomHall = Band(
+				startRoom.x + (0 if goingVertical else offsetWall),
+				startRoom.y + (offsetWall if goingVertical else 0),
+				lengthRoom, wallOrient, thickness, first = 1, stair = offsetCorrect
+			)
+			thickOtherHall = Band(
+				startOther.x + (0 if goingVerticalOther else offsetWallOther),
+				startOther.y + (offsetWallOther if goingVerticalOther else 0),
+				lengthOther, wallOtherOrient, thickness, first = 1, stair = -offsetCorrect
+			)
+			# The connecting lines start from the ends of the room's padding lines,
+			# which step diagonally in a staircase (as long as none of them flip around)
+			if all(lengthRoom + offsetCorrect * q >= 0 for q in thickRoomHall.getOffsets()):
+				step = Point(1, offsetWall * offsetCorrect) if goingVertical \
+					else Point(offsetWall * offsetCorrect, 1)
+				# Split the step into sideways and forward parts for the band
+				# (The connecting hall can run either way relative to the others)
+				side = step.x * abs(connectingVector.y) + step.y * abs(connectingVector.x)
+				thickConnectingHall = Band(
+					roomHall.getEndpoint().x, roomHall.getEndpoint().y,
+					dx + 1 if goingVertical else dy + 1, connectingOrientation,
+					thickness, first = 1, side = side,
+					shift = side * (step.x * connectingVector.x + step.y * connectingVector.y)
+				)
+				self.halls.append(thickConnectingHall)
+			else:
+				for line in thickRoomHall.getLines():
+					self.halls.append(Line(
+						line.getEndpoint().x, line.getEndpoint().y,
+						dx + 1 if goingVertical else dy + 1,
+						connectingOrientation
+					))
+
+			self.halls.append(thickRoomHall)
+			self.halls.append(thickOtherHall)
+
+		else: # Parallel above, Perpendicular below
+			#print("L-TYPE HALL GENERATED!!!")
+			roomHall = Line(
+				startRoom.x, startRoom.y,
+				dx + 1 if not goingVertical else dy + 1,
+				wallOrient
+			)
+			#print(roomHall.getEndpoint())
+			
+			otherHall = Line(
+				startOther.x, startOther.y,
+				dx + 1 if not goingVerticalOther else dy + 1,
+				wallOtherOrient
+			)
+
+			# Make sure when we use the offset for position that
+			# subtracting from other keeps us on the same side
+			offsetCorrectPos = -1 if (
+				wallOrient == 'n' and wallOtherOrient == 'w'
+				or wallOrient == 'w' and wallOtherOrient == 'n'
+				or wallOrient == 's' and wallOtherOrient == 'e'
+				or wallOrient == 'e' and wallOtherOrient == 's'
+			) else 1
+			# Make sure when we use the offset for length that
+			# our assumption that more positive lines are
+			# inside the turn holds mathematically
+			offsetCorrectLen = -1 if (
+				wallOrient == 'n' and wallOtherOrient == 'e'
+				or wallOrient == 'w' and wallOtherOrient == 's'
+				or wallOrient == 's' and wallOtherOrient == 'e'
+				or wallOrient == 'e' and wallOtherOrient == 's'
+			) else 1
+			# Make sure the padding lines don't intersect the wall
+			offsetWall = -1 if (
+				wallOrient == 'n' or wallOrient == 'w'
+			) else 1
+			offsetWallOther = -1 if (
+				wallOtherOrient == 's' or wallOtherOrient == 'e'
+			) else 1
+			# Randomly vary the amount of padding lines
+			hallNoise = rng.integers(-self.varianceHall, self.varianceHall + 1)
+			thickness = self.hallThickness - 1 + hallNoise
+			# Generate the padding lines as bands (see above)
+			self.halls.append(Band(
+				startRoom.x + (0 if goingVertical else offsetWall),
+				startRoom.y + (offsetWall if goingVertical else 0),
+				dx if not goingVertical else dy, wallOrient,
+				thickness, first = 1, stair = -offsetCorrectLen
+			))
+			self.halls.append(Band( # (Offsets get subtracted on this side)
+				startOther.x - (0 if goingVerticalOther else offsetWallOther),
+				startOther.y - (offsetWallOther if goingVerticalOther else 0),
+				dx if not goingVerticalOther else dy, wallOtherOrient,
+				thickness, first = 1, stair = offsetCorrectLen * offsetCorrectPos,
+				side = -offsetCorrectPos
+			))
+
+		self.halls.append(roomHall)
+		self.halls.append(otherHall)
+		# Update our bookkeeping
+		self.hallCounts[i] += 1
+		self.hallCounts[j] += 1
+
 	def genHalls(self, reset : bool):
 		"""Randomly generate hallways"""
 		if not reset:
 			return
+		self.invalidateLayers()
+		self.nextStream("halls")
 		# Erase old hallways	
 		self.halls = []
 		self.hallCounts = [0 for i in range(len(self.rooms))]
+		# Connect along a spanning tree plus some extra short edges
+		if self.hallGraph:
+			for i, j in self.rooms.getConnectingPairs(self.hallExtraFraction):
+				self.genHall(i, j)
+
+			return
+		# Get every room's nearest other rooms by taxicab distance between centroids
+		# (A room never makes more than hallAvgCount halls, so that's all we need)
+		nearest = self.rooms.getNearestIndices(self.hallAvgCount)
 		# Proceed from room to room
 		for i in range(len(self.rooms)):
-			room = self.rooms[i]
-			# Get taxicab distances from current room centroid to every other rooms centroid
-			distances = [
-				[j, room.getCentroid() | self.rooms[j].getCentroid()]
-				for j in range(len(self.rooms))
-			]
-			distances[i][1] = 2 * max([t[1] for t in distances]) # Eliminate own distance
-			distances = sorted(distances, key = lambda t : t[1])[:len(distances) - 1]
-			#print(distances)
-
 			k = 0 # Main loop
-			while self.hallCounts[i] < self.hallAvgCount:
-				j = distances[k][0] # Index of next nearest other room
-				mhDist = distances[k][1]
-				other = self.rooms[j]
-				# Tuple unpacking
-				wallOrient, wallCells = room.getNearestWall(other)
-				wallOtherOrient, wallOtherCells = other.getNearestWall(room)
-
-				#print(i, j, k, room.getAzimuth(other), wallOrient, len(wallCells))
-				# Decide the doorways' locations
-				startRoom = list(wallCells)[
-					np.random.randint(0, len(wallCells))
-				]
-				startOther = list(wallOtherCells)[
-					np.random.randint(0, len(wallOtherCells))
-				]
-				# Get the distance delta along both axes
-				delta = startRoom - startOther
-				dx = abs(delta.x)
-				dy = abs(delta.y)
-
-				#print(startRoom, startOther, dx, dy)
-				# Orientation booleans
-				goingVertical = wallOrient in ('n', 's')
-				goingVerticalOther = wallOtherOrient in ('n', 's')
-				# Produce an S-hall or an L-hall
-				if goingVertical and goingVerticalOther \
-					or not goingVertical and not goingVerticalOther:
-					# Randomly shift the meeting point of the hallways
-					if self.doHallShifting:
-						shiftRange = self.padding.x // 2 if not goingVertical \
-						else self.padding.y // 2
-						shiftRange -= self.hallThickness // 2
-						shiftRange = max(0, shiftRange)
-						shift = np.random.randint(-shiftRange, shiftRange + 1)
-						#print(shiftRange, shift)
-					else:
-						shift = 0
-					# Compute the initial hallway segments
-					roomHall = Line(
-						startRoom.x, startRoom.y,
-						dx // 2 + 1 + dx % 2 + shift if not goingVertical
-						else dy // 2 + 1 + dy % 2 + shift,
-						wallOrient
-					)
-					otherHall = Line(
-						startOther.x, startOther.y,
-						dx // 2 + 1 - shift if not goingVerticalOther
-						else dy // 2 + 1 - shift,
-						wallOtherOrient
-					)
-					# Determine the orientation of the connecting hallway segment
-					# (It comes out from the segment attached to the starting room)
-					connectingOrientation = roomHall.getNearestOrientation(
-						otherHall, mode = 'e'
-					)[0]
-					connectingHall = Line(
-						roomHall.getEndpoint().x, roomHall.getEndpoint().y,
-						dx + 1 if goingVertical else dy + 1,
-						connectingOrientation
-					)
-					# The other segments will be added at the bottom of the loop
-					self.halls.append(connectingHall)
-					# Initialize the offset for padding the thickness of this hallway
-					offset = 1
-					offsetCorrect = -1 if (
-						goingVertical and startRoom.x < startOther.x
-						or not goingVertical and startRoom.y < startOther.y
-					) else 1 # Make sure the staricase formation of the padded halls
-					# faces the right way;
-
-					# Make sure the padding lines don't intersect the wall
-					# (Keep doorways to 1 cell wide)
-					offsetWall = -1 if (
-						wallOrient == 'n' or wallOrient == 'w'
-					) else 1
-					offsetWallOther = -1 if (
-						wallOtherOrient == 'n' or wallOtherOrient == 'w'
-					) else 1
-					# Randomly vary the amount of padding lines
-					hallNoise = np.random.randint(-self.varianceHall, self.varianceHall + 1)
-					# Generate the padding lines
-					for t in range(self.hallThickness - 1 + hallNoise):
-						offsetEnd = offset * offsetCorrect
-						#print(offset, offsetEnd, offsetCorrect)
-						
-						thickRoomHall = Line(
-							startRoom.x + (
-								offset if goingVertical else offsetWall
-							),
-							startRoom.y + (
-								offset if not goingVertical else offsetWall
-							),
-							dx // 2 + dx % 2 + shift + offsetEnd
-							if not goingVertical
-							else dy // 2 + dy % 2 + shift + offsetEnd,
-							wallOrient
-						)
-
-						thickOtherHall = Line(
-							startOther.x + (
-								offset if goingVerticalOther else offsetWallOther
-							),
-							startOther.y + (
-								offset if not goingVerticalOther else offsetWallOther
-							),
-							dx // 2 - shift - offsetEnd
-							if not goingVerticalOther
-							else dy // 2 - shift - offsetEnd,
-							wallOtherOrient
-						)
+			while self.hallCounts[i] < self.hallAvgCount and nearest.shape[1] > 0:
+				j = nearest[i, k] # Index of next nearest other room
+				self.genHall(i, j)
+				# Advance to the next closest room (or wrap around to the first closest)
+				k += 1
+				k %= nearest.shape[1]
 
-						thickConnectingHall = Line(
-							thickRoomHall.getEndpoint().x, thickRoomHall.getEndpoint().y,
-							dx + 1 if goingVertical else dy + 1,
-							connectingOrientation
-						)
+	def gen(self, showProgress : bool = False):
+		"""Generate the rooms, then the hallways between them"""
+		key = self.getCacheKey("gen")
+		if self.loadCachedState(key):
+			if showProgress:
+				print(maskToString(self.draw()))
+			return
 
-						self.halls.append(thickConnectingHall)
-						self.halls.append(thickRoomHall)
-						self.halls.append(thickOtherHall)
-						# Sequence: 1, -1, 2, -2, 3, -3, ...
-						offset *= -1
-						if offset > 0:
-							offset += 1
-
-				else: # Parallel above, Perpendicular below
-					#print("L-TYPE HALL GENERATED!!!")
-					roomHall = Line(
-						startRoom.x, startRoom.y,
-						dx + 1 if not goingVertical else dy + 1,
-						wallOrient
-					)
-					#print(roomHall.getEndpoint())
-					
-					otherHall = Line(
-						startOther.x, startOther.y,
-						dx + 1 if not goingVerticalOther else dy + 1,
-						wallOtherOrient
-					)
+		self.genRooms(True)
+		if showProgress:
+			print(maskToString(self.draw()))
 
-					offset = 1
-					# Make sure when we use the offset for position that
-					# subtracting from other keeps us on the same side
-					offsetCorrectPos = -1 if (
-						wallOrient == 'n' and wallOtherOrient == 'w'
-						or wallOrient == 'w' and wallOtherOrient == 'n'
-						or wallOrient == 's' and wallOtherOrient == 'e'
-						or wallOrient == 'e' and wallOtherOrient == 's'
-					) else 1
-					# Make sure when we use the offset for length that
-					# our assumption that more positive lines are
-					# inside the turn holds mathematically
-					offsetCorrectLen = -1 if (
-						wallOrient == 'n' and wallOtherOrient == 'e'
-						or wallOrient == 'w' and wallOtherOrient == 's'
-						or wallOrient == 's' and wallOtherOrient == 'e'
-						or wallOrient == 'e' and wallOtherOrient == 's'
-					) else 1
-					# Make sure the padding lines don't intersect the wall
-					offsetWall = -1 if (
-						wallOrient == 'n' or wallOrient == 'w'
-					) else 1
-					offsetWallOther = -1 if (
-						wallOtherOrient == 's' or wallOtherOrient == 'e'
-					) else 1
-					# Randomly vary the amount of padding lines
-					hallNoise = np.random.randint(-self.varianceHall, self.varianceHall + 1)
-					# Generate the padding lines
-					for t in range(self.hallThickness - 1 + hallNoise):
-						offsetPos = offset * offsetCorrectPos
-						offsetLen = offset * offsetCorrectLen
-
-						thickRoomWall = Line(
-							startRoom.x + (
-								offset if goingVertical else offsetWall
-							),
-							startRoom.y + (
-								offset if not goingVertical else offsetWall
-							),
-							dx - offsetLen if not goingVertical
-							else dy - offsetLen,
-							wallOrient
-						)
+		self.genHalls(True)
+		if showProgress:
+			print(maskToString(self.draw()))
 
-						thickOtherWall = Line(
-							startOther.x - (
-								offsetPos if goingVerticalOther
-								else offsetWallOther
-							),
-							startOther.y - (
-								offsetPos if not goingVerticalOther
-								else offsetWallOther
-							),
-							dx - offsetLen if not goingVerticalOther
-							else dy - offsetLen,
-							wallOtherOrient
-						)
+		self.storeCachedState(key)
 
-						self.halls.append(thickRoomWall)
-						self.halls.append(thickOtherWall)
-						# See above sequence comment
-						offset *= -1
-						if offset > 0:
-							offset += 1
-
-				self.halls.append(roomHall)
-				self.halls.append(otherHall)
-				# Update our bookkeeping then advance to the next closest room
-				# (or wrap around to the first closest)
-				self.hallCounts[i] += 1
-				self.hallCounts[j] += 1
-				k += 1
-				k %= len(distances)
+	def genConnectors(self, connectors : dict, lines : dict):
+		"""
+		Run an L shaped hallway from every connector on the frame's edges
+		(see World.getConnectors) to the centroid of the nearest room;
+		Every one is exactly hallThickness wide, so the neighbor's matches up
+		"""
+		self.invalidateLayers()
+		t = self.hallThickness
+		lo = (t - 1) // 2 # Cells on either side of the connector's
+		center = Point(self.size.x // 2, self.size.y // 2)
+
+		for side, positions in sorted(connectors.items()):
+			for position in positions:
+				cell, (dx, dy) = self.getEdgeCell(side, position)
+				i = self.getNearestRoom(cell)
+				target = center if i < 0 else Point(*self.rooms.getCentroids()[i].tolist())
+				# Both legs overlap by a hall's width at the corner
+				if dx != 0: # Into the frame East-West, then North-South
+					self.halls.append(Rectangle(
+						min(cell.x, target.x) - lo, cell.y - lo,
+						abs(cell.x - target.x) + t, t
+					))
+					self.halls.append(Rectangle(
+						target.x - lo, min(cell.y, target.y) - lo,
+						t, abs(cell.y - target.y) + t
+					))
+				else: # Into the frame North-South, then East-West
+					self.halls.append(Rectangle(
+						cell.x - lo, min(cell.y, target.y) - lo,
+						t, abs(cell.y - target.y) + t
+					))
+					self.halls.append(Rectangle(
+						min(cell.x, target.x) - lo, target.y - lo,
+						abs(cell.x - target.x) + t, t
+					))
 	
+	def drawLayers(self) -> tuple:
+		"""Rasterize the base layer masks of the dungeon (room edges & fills, halls)"""
+		maskRoomEdge = np.zeros(self.size.npar, bool)
+		for r in self.rooms: # Stamp each room's edge into the frame directly
+			r.stampEdge(maskRoomEdge)
+		# Fills are unions of boxes, so they get rasterized all at once
+		w, h = self.size.x, self.size.y
+		maskRoomFill = rasterizeBoxes(collectBoxes(self.rooms), w, h)
+		maskHall = rasterizeBoxes(collectBoxes(self.halls), w, h)
+
+		return maskRoomEdge, maskRoomFill, maskHall
+
 	def draw(self, mode : str = '') -> np.array:
 		"""
 		Produce a 2D boolean numpy array mask of the dungeon.
@@ -472,20 +773,10 @@ class Catacombs:
 		3. Doors
 		4. Everything
 		"""
-		maskRoomEdge = np.zeros(self.size.npar, bool)
-		for r in self.rooms:
-			maskRoomEdge |= r.getMaskEdge(self.size.x, self.size.y)
-
-		maskRoomFill = np.zeros(self.size.npar, bool)
-		for r in self.rooms:
-			maskRoomFill |= r.getMaskFill(self.size.x, self.size.y)
-
-		maskHall = np.zeros(self.size.npar, bool)
-		for h in self.halls:
-			maskHall |= h.getMask(self.size.x, self.size.y)
+		maskRoomEdge, maskRoomFill, maskHall = self.getLayers()
 
 		if mode.upper() == "HALLONLY":
-			return maskHall
+			return maskHall.copy()
 		elif mode.upper() == "NOWALLS":
 			return maskHall | (
 				maskRoomFill & ~ maskRoomEdge
@@ -499,13 +790,13 @@ class Catacombs:
 		elif mode.upper() == "DOORONLY":
 			return maskHall & maskRoomEdge
 		elif mode.upper() == "IMAGE":
-			return np.stack([
+			return self.stackLayers((
 				maskRoomFill & ~maskRoomEdge,
 				maskHall,
 				maskRoomEdge,
 				maskRoomEdge & maskHall,
 				maskRoomFill | maskHall
-			])
+			))
 			
 		return maskRoomEdge | maskHall & ~ (
 			maskRoomFill & maskHall & ~ (
@@ -514,7 +805,7 @@ class Catacombs:
 		)
 	def getImageData(self) -> dict:
 		"""Separate image layer masks out into values in a dictionary"""
-		layers = self.draw("IMAGE")
+		layers = self.getImageLayers()
 		return {
 			"floor" : layers[0],
 			"hall" : layers[1],
@@ -524,8 +815,19 @@ class Catacombs:
 			"dungeonType": "catacombs"
 		}
 
-class Caves:
+class Caves(Level):
 	"""Circle-based caves and tunnels"""
+	# Bits of the label image, one per layer (in the same order as layers mode)
+	(
+		bitRoom,
+		bitRoomCarvePos, bitRoomCarveNeg,
+		bitRoomEdgePos, bitRoomEdgeNeg,
+		bitRoomFloorPos, bitRoomFloorNeg,
+		bitHall, bitHallEdge, bitHallFloor
+	) = (1 << k for k in range(10))
+	streamPhases = ("rooms", "carves", "halls", "connectors")
+	cachedAttributes = ("rooms", "carves", "carvePolarities", "halls", "hallCounts")
+
 	def __init__(
 		self, w : int, h : int,
 		rct : int, raap : float,
@@ -533,7 +835,9 @@ class Caves:
 		carveq : float, carver : int,
 		vari : int, conn : int,
 		pad : int = 0, thick : int = 1,
-		varihr : int = 0, variha : float = 0.
+		varihr : int = 0, variha : float = 0.,
+		graph : bool = False, extra : float = 0.,
+		seed : int = None
 	):
 		"""
 		Requires a width and height in cells, a room count, an average area per room
@@ -544,9 +848,13 @@ class Caves:
 		room radius, and how many connections each room should have at minimum.
 		
 		Optionally, a radial padding radius, a hallway radius, the absolute deviation
-		of the hallway radius, and the absolute deviation of the hallway angle
-		can be specified.
+		of the hallway radius, the absolute deviation of the hallway angle,
+		whether to plan hallways as a spanning tree over the rooms instead
+		of by connection count, what fraction of extra short hallways
+		to add on top of that tree, and a seed (or numpy Generator)
+		to make the cave reproducible can be specified.
 		"""
+		self.params = getParams(locals())
 		self.size = Point(w, h)
 		self.roomCount = rct
 		self.roomAvgAreaPercent = raap
@@ -573,11 +881,14 @@ class Caves:
 		self.hallRadius = thick
 		self.varianceHallRadius = varihr
 		self.varianceHallAngle = variha
+		self.hallGraph = graph
+		self.hallExtraFraction = extra
+		self.setSeed(seed)
 
-		self.rooms = []
+		self.rooms = CircleSet()
 		self.carves = []
 		self.carvePolarities = []
-		self.halls = []
+		self.halls = CircleSet()
 		self.hallCounts = []
 
 		# Warnings
@@ -628,8 +939,121 @@ class Caves:
 		"""Generic representation"""
 		return self.__str__()
 
-	def genCarves(self, attemptsOverride : int = 0, showProgress : bool = False):
-		"""Randomly carve rooms"""
+	def genCarveGroup(self, room : Circle, maxAttempts : int) -> tuple:
+		"""Randomly carve one room, one candidate carve at a time"""
+		rng = self.streams["carves"]
+		carveGroup = CircleSet()
+		polarityGroup = []
+		# Carves sit on the room's edge, so they never reach further out
+		# than the biggest carve radius; Only that much of the frame gets a map
+		margin = self.carveSize + self.carveNoise
+		x0, y0, x1, y1 = room.getBounds()
+		x0, y0 = max(x0 - margin, 0), max(y0 - margin, 0)
+		x1, y1 = min(x1 + margin, self.size.x), min(y1 + margin, self.size.y)
+		occupied = OccupancyMap(x1 - x0, y1 - y0, x0, y0)
+		attempts = 0
+		for c in range(self.carveCount):
+			while True: # Try to find a good origin and radius for the new carve
+				if attempts >= maxAttempts:
+					break
+
+				carveOrigin = room.getAngledEdgeCell(
+					rng.uniform() * 360.
+				)
+				carveRadius = self.carveSize + rng.integers(
+					-self.carveNoise, self.carveNoise + 1
+				)
+
+				if np.any( # Check that the carve will be in the frame
+					(
+						carveOrigin.npar - np.array((carveRadius, carveRadius))
+					) < np.zeros(2, int)
+				) or np.any(
+					(
+						carveOrigin.npar + np.array((carveRadius, carveRadius))
+					) >= self.size.npar
+				):
+					attempts += 1
+					continue
+
+				newCarve = Circle(carveOrigin.x, carveOrigin.y, carveRadius)
+				# Check that the carve doesn't intersect any other carves
+				overlapping = occupied.collides(newCarve)
+
+				attempts += 1
+
+				if overlapping:
+					continue # Enforce no carves overlap each other
+				else:
+					break
+			
+			if attempts < maxAttempts:
+				carvePolarity = rng.uniform() < self.carveChance
+
+				carveGroup.append(newCarve)
+				polarityGroup.append(carvePolarity)
+				occupied.add(newCarve)
+			else:
+				break
+
+		return carveGroup, polarityGroup, attempts
+
+	def genCarveGroupBatched(self, room : Circle, maxAttempts : int, batchSize : int) -> tuple:
+		"""
+		Randomly carve one room, drawing candidate carves a batch at a time;
+		Candidates out of the frame or centered inside an earlier carve
+		get thrown out all at once, so only the rest get tested one by one
+		"""
+		rng = self.streams["carves"]
+		carveGroup = CircleSet()
+		polarityGroup = []
+		attempts = 0
+
+		while len(carveGroup) < self.carveCount and attempts < maxAttempts:
+			k = min(batchSize, maxAttempts - attempts)
+			origins = room.getAngledEdgeCells(rng.uniform(size = k) * 360.)
+			radii = self.carveSize + rng.integers(
+				-self.carveNoise, self.carveNoise + 1, k
+			)
+			polarities = rng.uniform(size = k) < self.carveChance
+			# Check that the carves will be in the frame
+			R = radii[:, np.newaxis]
+			valid = np.all(origins - R >= 0, axis = 1) \
+				& np.all(origins + R < self.size.tupl, axis = 1)
+			# Check against the carves from earlier batches by center distance
+			if len(carveGroup) > 0:
+				D2 = (
+					(origins[:, np.newaxis, :] - carveGroup.origins[np.newaxis, :, :]) ** 2
+				).sum(axis = 2)
+				valid &= ~np.any(D2 <= np.maximum(R, carveGroup.radii) ** 2, axis = 1)
+
+			for c in range(k):
+				attempts += 1
+				if not valid[c]:
+					continue
+
+				newCarve = Circle(origins[c, 0], origins[c, 1], radii[c])
+				# Candidates from this same batch haven't been checked yet
+				if carveGroup.overlapsAny(newCarve):
+					continue
+
+				carveGroup.append(newCarve)
+				polarityGroup.append(bool(polarities[c]))
+				if len(carveGroup) >= self.carveCount:
+					break
+
+		return carveGroup, polarityGroup, attempts
+
+	def genCarves(
+		self, attemptsOverride : int = 0, showProgress : bool = False,
+		batchSize : int = 0
+	):
+		"""
+		Randomly carve rooms; Optionally, candidate carves can be drawn
+		a batch at a time rather than one by one
+		"""
+		self.invalidateLayers()
+		self.nextStream("carves")
 		self.carves = []
 		self.carvePolarities = []
 		
@@ -652,58 +1076,12 @@ class Caves:
 			print("Carve Ratio:", carveRatio)
 
 		for r in self.rooms:
-			carveGroup = []
-			polarityGroup = []
-			carveMasks = []
-			attempts = 0
-			for c in range(self.carveCount):
-				while True: # Try to find a good origin and radius for the new carve
-					if attempts >= maxAttempts:
-						break
-
-					carveOrigin = r.getAngledEdgeCell(
-						np.random.uniform() * 360.
-					)
-					carveRadius = self.carveSize + np.random.randint(
-						-self.carveNoise, self.carveNoise + 1
-					)
-
-					if np.any( # Check that the carve will be in the frame
-						(
-							carveOrigin.npar - np.array((carveRadius, carveRadius))
-						) < np.zeros(2, int)
-					) or np.any(
-						(
-							carveOrigin.npar + np.array((carveRadius, carveRadius))
-						) >= self.size.npar
-					):
-						attempts += 1
-						continue
-
-					newCarve = Circle(carveOrigin.x, carveOrigin.y, carveRadius)
-					newCarveMask = newCarve.getMaskFill(self.size.x, self.size.y)
-					overlapping = False
-
-					for m in carveMasks: # Check that the carve doesn't instersect
-						if np.any(newCarveMask & m): # any other carves
-							overlapping = True
-							break
-
-					attempts += 1
-
-					if overlapping:
-						continue # Enforce no carves overlap each other
-					else:
-						break
-				
-				if attempts < maxAttempts:
-					carvePolarity = np.random.uniform() < self.carveChance
-
-					carveGroup.append(newCarve)
-					polarityGroup.append(carvePolarity)
-					carveMasks.append(newCarveMask)
-				else:
-					break
+			if batchSize > 0:
+				carveGroup, polarityGroup, attempts = self.genCarveGroupBatched(
+					r, maxAttempts, batchSize
+				)
+			else:
+				carveGroup, polarityGroup, attempts = self.genCarveGroup(r, maxAttempts)
 
 			self.carves.append(carveGroup)
 			self.carvePolarities.append(polarityGroup)
@@ -714,17 +1092,32 @@ class Caves:
 
 	def genRooms(
 		self, attemptsOverride : int = 0, attemptsOverrideCarve : int = 0,
-		tailCall : bool = False, showProgress : bool = False
+		tailCall : bool = False, showProgress : bool = False,
+		carveBatchSize : int = 0
 	):
-		"""Randomly generate rooms"""
+		"""
+		Randomly generate rooms; With a tail call, the carves and halls too,
+		in which case the whole cave can come from a cache
+		"""
+		if tailCall:
+			key = self.getCacheKey(
+				"genRooms", (attemptsOverride, attemptsOverrideCarve, carveBatchSize)
+			)
+			if self.loadCachedState(key):
+				if showProgress:
+					print(maskToString(self.draw()))
+				return
+
+		self.invalidateLayers()
+		rng = self.nextStream("rooms")
 		# Clear old rooms and halls
-		self.rooms = []
+		self.rooms = CircleSet()
 		self.carves = []
 		self.carvePolarities = []
-		self.halls = []
+		self.halls = CircleSet()
 		self.hallCounts = [0 for i in range(len(self.rooms))]
-
-		roomMasks = []
+		# One raster of every placed room, checked through each candidate's box
+		occupied = OccupancyMap(self.size.x + self.padding, self.size.y + self.padding)
 		# Cap how many times circles are generated
 		attempts = 0
 		if attemptsOverride > 0:
@@ -752,7 +1145,7 @@ class Caves:
 		# Try to generate valid rooms
 		while len(self.rooms) < self.roomCount:
 			attempts += 1
-			noise = np.random.randint(-self.variance, self.variance + 1)
+			noise = rng.integers(-self.variance, self.variance + 1)
 			newRadius = self.roomAvgRad + noise
 
 			originSpace = Point(self.size.x - newRadius, self.size.y - newRadius)
@@ -767,28 +1160,18 @@ class Caves:
 			
 			else:
 				newOrigin = Point(
-					*np.random.randint((newRadius, newRadius), originSpace.tupl, 2)
+					*rng.integers((newRadius, newRadius), originSpace.tupl, 2)
 				)
 
 				newRoom = Circle(newOrigin.x, newOrigin.y, newRadius)
 				newRoomPadZone = Circle(
 					newOrigin.x, newOrigin.y,
 					newRadius + self.padding
-				).getMaskFill(self.size.x + self.padding, self.size.y + self.padding)
-
-				nonOverlapping = True
-				for m in roomMasks:
-					if np.any(newRoomPadZone & m):
-						nonOverlapping = False
-						break
+				)
 
-				if nonOverlapping:
+				if not occupied.collides(newRoomPadZone):
 					self.rooms.append(newRoom)
-					roomMasks.append(
-						newRoom.getMaskFill(
-							self.size.x + self.padding, self.size.y + self.padding
-						)
-					)
+					occupied.add(newRoom)
 
 					print(noise, newRadius, newOrigin)
 					print(newRoom)
@@ -807,91 +1190,136 @@ class Caves:
 
 		if tailCall:
 			print("Now carving out each room...")
-			self.genCarves(attemptsOverrideCarve, showProgress)
+			self.genCarves(attemptsOverrideCarve, showProgress, carveBatchSize)
 			print("Now connecting rooms...")
 			self.genHalls(showProgress)
+			self.storeCachedState(key)
+
+	def getTunnelTarget(self, i : int) -> OccupancyMap:
+		"""
+		Rasterize a room (by index) with its carves applied, only over the
+		bounding box of the room and its carves, for tunnels to dig towards
+		"""
+		room = self.rooms[i]
+		x0, y0, x1, y1 = room.getBounds()
+		for c in self.carves[i]:
+			cx0, cy0, cx1, cy1 = c.getBounds()
+			x0, y0 = min(x0, cx0), min(y0, cy0)
+			x1, y1 = max(x1, cx1), max(y1, cy1)
+
+		target = OccupancyMap(x1 - x0, y1 - y0, x0, y0)
+		target.add(room)
+		maskRoomFloorNeg = np.zeros_like(target.mask)
+
+		for j in range(len(self.carves[i])):
+			if self.carvePolarities[i][j]:
+				target.add(self.carves[i][j])
+			else:
+				fillMask, offset = self.carves[i][j].getLocalMaskFill()
+				edgeMask, offset = self.carves[i][j].getLocalMaskEdge()
+				stampMask(maskRoomFloorNeg, fillMask & ~edgeMask, offset - target.origin)
+
+		target.mask &= ~maskRoomFloorNeg
+
+		return target
+
+	def genHall(self, i : int, j : int, target : OccupancyMap = None):
+		"""
+		Dig a tunnel from one room to another (by index); The target room's raster
+		can be passed in when digging many tunnels to the same room
+		"""
+		self.invalidateLayers()
+		rng = self.streams["halls"]
+		room = self.rooms[i]
+		other = self.rooms[j]
+		if target is None:
+			target = self.getTunnelTarget(i)
+
+		# Decide the doorways' location
+		heading = other.getAzimuth(room)
+		self.digTunnel(other.getAngledEdgeCell(heading), room, target, rng)
+
+		print("Generated a hall from", other)
+
+		self.hallCounts[i] += 1
+		self.hallCounts[j] += 1
+
+	def digTunnel(
+		self, next : Point, room : Circle, target : OccupancyMap,
+		rng : np.random.Generator
+	):
+		"""Dig from a cell towards a room, a circle at a time, until hitting its raster"""
+		while True: # Add on enough tunnel cells
+			firstRadius = True
+
+			while firstRadius or np.any( # Check that the tunnel 
+				( # will be in the frame
+					next.npar - np.array((nextRadius, nextRadius))
+				) < np.zeros(2, int)
+			) or np.any(
+				(
+					next.npar + np.array((nextRadius, nextRadius))
+				) >= self.size.npar
+			):
+				nextRadius = self.hallRadius + rng.integers(
+					-self.varianceHallRadius, self.varianceHallRadius + 1
+				) # Recompute the radius
+				firstRadius = False
+
+			nextTunnel = Circle(next.x, next.y, nextRadius)
+			self.halls.append(nextTunnel)
+
+			if target.collides(nextTunnel): # Stop digging if we have hit the target room
+				break
+			else:
+				next = nextTunnel.getAngledEdgeCell(
+					nextTunnel.getAzimuth(room) + rng.uniform(
+						-self.varianceHallAngle, self.varianceHallAngle
+					)
+				)
 
 	def genHalls(self, showProgress : bool = False):
 		"""Randomly generate hallways"""
+		self.invalidateLayers()
+		self.nextStream("halls")
 		# Erase old hallways	
-		self.halls = []
+		self.halls = CircleSet()
 		self.hallCounts = [0 for i in range(len(self.rooms))]
+		# Connect along a spanning tree plus some extra short edges,
+		# grouped by target room so each room's raster only gets made once
+		if self.hallGraph:
+			pairs = self.rooms.getConnectingPairs(self.hallExtraFraction)
+			pairs = pairs[np.argsort(pairs[:, 0], kind = "stable")]
+			for n, (i, j) in enumerate(pairs):
+				if n == 0 or i != pairs[n - 1, 0]:
+					target = self.getTunnelTarget(i)
+					print("Digging tunnels to room", self.rooms[i])
+
+				self.genHall(i, j, target)
+
+			if showProgress:
+				print(maskToString(self.draw()))
+
+			return
+		# Get every room's nearest other rooms by taxicab distance between centroids
+		# (A room never makes more than hallAvgCount halls, so that's all we need)
+		nearest = self.rooms.getNearestIndices(self.hallAvgCount)
 		# Proceed from room to room
 		for i in range(len(self.rooms)):
 			room = self.rooms[i]
-			# Get taxicab distances from current room centroid to every other rooms centroid
-			distances = [
-				[j, room.getCentroid() | self.rooms[j].getCentroid()]
-				for j in range(len(self.rooms))
-			]
-			distances[i][1] = 2 * max([t[1] for t in distances]) # Eliminate own distance
-			distances = sorted(distances, key = lambda t : t[1])[:len(distances) - 1]
-
-			# Produce a collision mask of the current room
-			maskRoom = room.getMaskFill(*self.size.tupl)
-			maskRoomCarvePos = np.zeros(self.size.npar, bool)
-			maskRoomFloorNeg = np.zeros(self.size.npar, bool)
-
-			for j in range(len(self.carves[i])):
-				if self.carvePolarities[i][j]:
-					maskRoomCarvePos |= self.carves[i][j].getMaskFill(*self.size.tupl)
-				else:
-					maskRoomFloorNeg |= (
-						self.carves[i][j].getMaskFill(*self.size.tupl)
-						& ~self.carves[i][j].getMaskEdge(*self.size.tupl)
-					)
 
-			maskRoom |= maskRoomCarvePos
-			maskRoom &= ~maskRoomFloorNeg
+			# Produce a collision raster of the current room
+			target = self.getTunnelTarget(i)
 
 			print("Digging tunnels to room", room)
 
 			k = 0 # Main loop
-			while self.hallCounts[i] < self.hallAvgCount:
-				j = distances[k][0] # Index of next nearest other room
-				mhDist = distances[k][1]
-				other = self.rooms[j]
-				# Decide the doorways' location
-				heading = other.getAzimuth(room)
-				next = other.getAngledEdgeCell(heading)
-
-				while True: # Add on enough tunnel cells
-					firstRadius = True
-
-					while firstRadius or np.any( # Check that the tunnel 
-						( # will be in the frame
-							next.npar - np.array((nextRadius, nextRadius))
-						) < np.zeros(2, int)
-					) or np.any(
-						(
-							next.npar + np.array((nextRadius, nextRadius))
-						) >= self.size.npar
-					):
-						nextRadius = self.hallRadius + np.random.randint(
-							-self.varianceHallRadius, self.varianceHallRadius + 1
-						) # Recompute the radius
-						firstRadius = False
-
-					nextTunnel = Circle(next.x, next.y, nextRadius)
-					self.halls.append(nextTunnel)
-
-					if np.any(
-						nextTunnel.getMaskFill(*self.size.tupl) & maskRoom
-					): # Stop digging if we have hit the target room
-						break
-					else:
-						next = nextTunnel.getAngledEdgeCell(
-							nextTunnel.getAzimuth(room) + np.random.uniform(
-								-self.varianceHallAngle, self.varianceHallAngle
-							)
-						)
-
-				print("Generated a hall from", other)
-
-				self.hallCounts[i] += 1
-				self.hallCounts[j] += 1
+			while self.hallCounts[i] < self.hallAvgCount and nearest.shape[1] > 0:
+				j = nearest[i, k] # Index of next nearest other room
+				self.genHall(i, j, target)
+				# Advance to the next closest room (or wrap around to the first closest)
 				k += 1
-				k %= len(distances)
+				k %= nearest.shape[1]
 		
 		if showProgress:
 			print(maskToString(self.draw()))
@@ -899,6 +1327,81 @@ class Caves:
 	def gen(self, showProgress : bool = False):
 		self.genRooms(tailCall = True, showProgress = showProgress)
 
+	def genConnectors(self, connectors : dict, lines : dict):
+		"""
+		Open a tunnel out of every connector on the frame's edges
+		(see World.getConnectors), dug towards the nearest room;
+		The circle on the edge is always hallRadius wide, so the neighbor's matches up
+		"""
+		self.invalidateLayers()
+		rng = self.nextStream("connectors")
+		radius = self.hallRadius
+		# Head straight in far enough that the dig never has to leave the frame
+		depth = 2 * (self.hallRadius + self.varianceHallRadius) + 1
+
+		for side, positions in sorted(connectors.items()):
+			for position in positions:
+				cell, (dx, dy) = self.getEdgeCell(side, position)
+				steps = list(range(0, depth, max(1, radius))) + [depth]
+				for step in steps:
+					stub = Circle(cell.x + dx * step, cell.y + dy * step, radius)
+					self.halls.append(stub)
+
+				i = self.getNearestRoom(cell)
+				if i < 0:
+					continue
+
+				room = self.rooms[i]
+				target = self.getTunnelTarget(i)
+				if not target.collides(stub):
+					self.digTunnel(
+						stub.getAngledEdgeCell(stub.getAzimuth(room)), room, target, rng
+					)
+
+	def drawLayers(self) -> tuple:
+		"""
+		Rasterize every shape into a single label image in one sweep,
+		where bit k of each cell is layer k of layers mode
+		(Comes back as a 1-tuple for the layer cache)
+		"""
+		labels = np.zeros(self.size.npar, np.uint16)
+		# Lookup tables of the bits set (outside, on the edge, on the floor) of each kind
+		table = lambda fill, edge, floor : np.array(
+			(0, fill | edge, fill | floor), np.uint16
+		)
+		tableRoom = table(self.bitRoom, self.bitRoomEdgePos, self.bitRoomFloorPos)
+		tableCarvePos = table(
+			self.bitRoomCarvePos, self.bitRoomEdgePos, self.bitRoomFloorPos
+		)
+		tableCarveNeg = table(
+			self.bitRoomCarveNeg, self.bitRoomEdgeNeg, self.bitRoomFloorNeg
+		)
+		tableHall = table(self.bitHall, self.bitHallEdge, self.bitHallFloor)
+		# Each shape only labels its bounding box, then gets stamped in
+		for r in self.rooms:
+			stampMask(labels, *r.getLocalLabels(tableRoom))
+		# Keep the polarity of the carves
+		for i in range(len(self.carves)):
+			carveGroup = self.carves[i]
+			polarityGroup = self.carvePolarities[i]
+			for j in range(len(carveGroup)):
+				stampMask(labels, *carveGroup[j].getLocalLabels(
+					tableCarvePos if polarityGroup[j] else tableCarveNeg
+				))
+
+		for h in self.halls:
+			stampMask(labels, *h.getLocalLabels(tableHall))
+
+		return (labels,)
+
+	def splitLabels(self, labels : np.array) -> np.array:
+		"""Split the label image back out into its layers, all in one go"""
+		return (labels & (1 << np.arange(10, dtype = np.uint16))[:, np.newaxis, np.newaxis]) != 0
+
+	def packLayers(self, layers : tuple) -> tuple:
+		"""Bit-pack each layer of the label image on its own"""
+		return tuple(PackedMask(layer) for layer in self.splitLabels(layers[0]))
+
 	def draw(self, mode : str = ""):
 		"""
 		Produce a 2D boolean numpy array mask of the dungeon.
@@ -922,50 +1425,17 @@ class Caves:
 		3. Doors
 		4. Everything
 		"""
-		maskRoom = np.zeros(self.size.npar, bool)
-		maskRoomCarvePos = np.zeros(self.size.npar, bool)
-		maskRoomCarveNeg = np.zeros(self.size.npar, bool)
-		maskRoomEdgePos = np.zeros(self.size.npar, bool)
-		maskRoomEdgeNeg = np.zeros(self.size.npar, bool)
-		maskRoomFloorPos = np.zeros(self.size.npar, bool)
-		maskRoomFloorNeg = np.zeros(self.size.npar, bool)
-
-		maskHall = np.zeros(self.size.npar, bool)
-		maskHallEdge = np.zeros(self.size.npar, bool)
-		maskHallFloor = np.zeros(self.size.npar, bool)
-		# Combine all the edge and fill masks of the rooms
-		for r in self.rooms:
-			edgeMask = r.getMaskEdge(*self.size.tupl)
-			fillMask = r.getMaskFill(*self.size.tupl)
-
-			maskRoom |= fillMask
-			maskRoomEdgePos |= edgeMask
-			maskRoomFloorPos |= fillMask & ~edgeMask # Floor is Fill - Edge
-			# And Boolean - is A & ~B
-		# Combine all the edge and fill masks of the carves, keeping polarity
-		for i in range(len(self.carves)):
-			carveGroup = self.carves[i]
-			polarityGroup = self.carvePolarities[i]
-			for j in range(len(carveGroup)):
-				edgeMask = carveGroup[j].getMaskEdge(*self.size.tupl)
-				fillMask = carveGroup[j].getMaskFill(*self.size.tupl)
-
-				if polarityGroup[j]:
-					maskRoomCarvePos |= fillMask
-					maskRoomEdgePos |= edgeMask
-					maskRoomFloorPos |= fillMask & ~edgeMask
-				else:
-					maskRoomCarveNeg |= fillMask
-					maskRoomEdgeNeg |= edgeMask
-					maskRoomFloorNeg |= fillMask & ~edgeMask
-		# Combine all the edge and fill masks of the tunnels
-		for h in self.halls:
-			edgeMask = h.getMaskEdge(*self.size.tupl)
-			fillMask = h.getMaskFill(*self.size.tupl)
-
-			maskHall |= fillMask
-			maskHallEdge |= edgeMask
-			maskHallFloor |= fillMask & ~edgeMask
+		layers = self.getLayers()
+		if len(layers) == 1: # Just the label image, rather than packed layers
+			layers = self.splitLabels(layers[0])
+
+		(
+			maskRoom,
+			maskRoomCarvePos, maskRoomCarveNeg,
+			maskRoomEdgePos, maskRoomEdgeNeg,
+			maskRoomFloorPos, maskRoomFloorNeg,
+			maskHall, maskHallEdge, maskHallFloor
+		) = layers
 
 		if mode.upper() == "NOWALLS": # Remove all negative carve space from floors,
 			# then tack on the hall floors
@@ -975,7 +1445,7 @@ class Caves:
 		elif mode.upper() == "HALLONLY": # This removes overlapping internal edges
 			return maskHallEdge & ~maskHallFloor
 		elif mode.upper() == "LAYERS":
-			return np.array((
+			return self.stackLayers((
 				maskRoom,
 				maskRoomCarvePos, maskRoomCarveNeg,
 				maskRoomEdgePos, maskRoomEdgeNeg,
@@ -1021,7 +1491,7 @@ class Caves:
 
 	def getImageData(self) -> dict:
 		"""Separate image layer masks out into values in a dictionary"""
-		layers = self.draw("IMAGE")
+		layers = self.getImageLayers()
 		return {
 			"floorHall": layers[0],
 			"floorRoom": layers[1],
@@ -1032,8 +1502,13 @@ class Caves:
 			"dungeonType": "caves"
 		}
 
-class City:
+class City(Level):
 	"""Grid-planned cities and towns"""
+	streamPhases = ("layout", "buildings")
+	cachedAttributes = (
+		"streets", "lots", "plazas", "plazaLots", "buildings", "doors"
+	)
+
 	def __init__(
 		self, w : int, h : int, streetv : int, streeth : int,
 		streetw : int, varis : int,
@@ -1041,7 +1516,8 @@ class City:
 		plazap : float, plazabp : float, 
 		plazax : int, plazay : int, plazao : bool,
 		varibx : int = 0, variby : int = 0,
-		padbx : int = 0, padby : int = 0
+		padbx : int = 0, padby : int = 0,
+		seed : int = None
 	):
 		"""
 		Requires a width & height in cells, a count of vertical and horizontal streets,
@@ -1054,8 +1530,10 @@ class City:
 		and whether plazas can overlap or not.
 
 		Optionally, the absolute deviation of the width and height of, as well as
-		the padding space around, each building in a lot or plaza, can be specified.
+		the padding space around, each building in a lot or plaza,
+		and a seed (or numpy Generator) to make the city reproducible can be specified.
 		"""
+		self.params = getParams(locals())
 		self.size = Point(w, h)
 		self.streetCount = Point(streetv, streeth)
 		self.streetWidth = streetw
@@ -1087,11 +1565,12 @@ class City:
 		self.plazaBuildingChance = plazabp
 		self.plazaSize = Point(plazax, plazay)
 		self.plazaOverlap = plazao
+		self.setSeed(seed)
 
 		self.streets = []
 		self.lots = []
 		self.plazas = []
-		self.buildings = []
+		self.buildings = RectangleSet()
 		self.doors = []
 
 	def __str__(self) -> str:
@@ -1135,46 +1614,36 @@ class City:
 		"""Evenly lay out the streets, lots, and plazas"""
 		if not reset:
 			return
+		key = self.getCacheKey("layout")
+		if self.loadCachedState(key):
+			return
+		self.invalidateLayers()
+		rng = self.nextStream("layout")
 
 		self.streets = []
 		self.lots = []
 		self.plazas = []
-		self.buildings = []
+		self.buildings = RectangleSet()
 		self.doors = []
 		# Even if a street is thin, start it from the absolute middle
 		middleOfStreet = self.streetMaxWidth // 2 - (1 - (self.streetMaxWidth % 2))
 
 		for xi in range(self.streetCount.x): # North-South streets
 			x = xi * (self.streetMaxWidth + self.lotSize.x)
-			width = self.streetWidth + np.random.randint(
+			width = self.streetWidth + rng.integers(
 				-self.varianceStreet, self.varianceStreet + 1
 			)
 
-			middle = x + middleOfStreet
-			xl = middle
-			d = 1
-			for i in range(width):
-				self.streets.append(Line(xl, 0, self.size.y, 's'))
-				xl = middle + d
-				d *= -1 # Alternate new lines on opposite sides
-				if d > 0: # 1, -1, 2, -2, ...
-					d += 1
+			# Lines alternate on opposite sides of the middle: 0, 1, -1, 2, -2, ...
+			self.streets.append(Band(x + middleOfStreet, 0, self.size.y, 's', width))
 
 		for yi in range(self.streetCount.y): # East-West Streets
 			y = yi * (self.streetMaxWidth + self.lotSize.y)
-			width = self.streetWidth + np.random.randint(
+			width = self.streetWidth + rng.integers(
 				-self.varianceStreet, self.varianceStreet + 1
 			)
 
-			middle = y + middleOfStreet
-			yl = middle
-			d = 1
-			for i in range(width):
-				self.streets.append(Line(0, yl, self.size.x, 'e'))
-				yl = middle + d
-				d *= -1
-				if d > 0:
-					d += 1
+			self.streets.append(Band(0, y + middleOfStreet, self.size.x, 'e', width))
 		# Keep track of what lot spots are part of a plaza
 		self.plazaLots = np.zeros(self.streetCount.npar - 1, bool)
 		deferPlaza = False
@@ -1189,7 +1658,7 @@ class City:
 					).npar
 				) + self.streetMaxWidth
 
-				isPlaza = (np.random.uniform() < self.plazaChance) or deferPlaza
+				isPlaza = (rng.uniform() < self.plazaChance) or deferPlaza
 				cellsOpen = (self.streetCount - 1) - Point(xi, yi)
 				
 				if cellsOpen.x < self.plazaSize.x or cellsOpen.y < self.plazaSize.y \
@@ -1230,13 +1699,21 @@ class City:
 					self.lots.append(
 						Rectangle(origin.x, origin.y, self.lotSize.x, self.lotSize.y)
 					)
+
+		self.storeCachedState(key)
 	
 	def genBuildings(self, reset : bool, attemptsOverride : int = 0):
 		"""Randomly generate buildings on each lot"""
 		if not reset:
 			return
+		# Buildings go on the current layout, so only cache them on a cached one
+		key = self.getCacheKey("buildings", (attemptsOverride,), False)
+		if self.loadCachedState(key):
+			return
+		self.invalidateLayers()
+		rng = self.nextStream("buildings")
 
-		self.buildings = []
+		self.buildings = RectangleSet()
 		self.doors = []
 		# Cap how many times rectangles are generated
 		if attemptsOverride > 0:
@@ -1255,15 +1732,23 @@ class City:
 					)
 				)
 			)
+		# Placed buildings get bucketed into a grid of about building sized cells,
+		# so each candidate only gets checked against its neighbors
+		grid = SpatialGrid(
+			max(
+				self.buildingSize.x + self.varianceBuilding.x,
+				self.buildingSize.y + self.varianceBuilding.y
+			) + 2 * max(self.buildingPadding.x, self.buildingPadding.y)
+		)
 		# Try to generate valid rooms
 		for block in self.lots + self.plazas:
 			# Handle lots and plazas appropriately
 			if block in self.lots:
-				build = np.random.uniform() < self.buildingChance
+				build = rng.uniform() < self.buildingChance
 				buildCount = self.buildingCount
 				maxAttemptsActual = maxAttempts
 			else: # We need to scale by the lot-size of the plaza to be proportional
-				build = np.random.uniform() < self.plazaBuildingChance
+				build = rng.uniform() < self.plazaBuildingChance
 				buildCount = self.buildingCount * np.prod(self.plazaSize.npar)
 				maxAttemptsActual = maxAttempts * np.prod(self.plazaSize.npar)
 
@@ -1281,14 +1766,14 @@ class City:
 			# Just like genRooms from Catacombs
 			while buildingsPlaced < buildCount:
 				attempts += 1
-				noise = np.random.randint(
+				noise = rng.integers(
 					-self.varianceBuilding.npar[::-1],
 					self.varianceBuilding.npar[::-1] + 1,
 					2
 				)
 				newOrigin = Point( # We make this first instead of the size
 					*( # Since we account for the max size in the extent variable
-						np.random.randint(block.origin.npar, extent.npar, 2)[::-1]
+						rng.integers(block.origin.npar, extent.npar, 2)[::-1]
 					)
 				)
 				newSize = Point(
@@ -1306,30 +1791,25 @@ class City:
 					newSize.y + 2 * self.buildingPadding.y,
 				)
 
-				nonOverlapping = True
-				for b in self.buildings:
-					if newBuildingPadZone & b:
-						nonOverlapping = False
-						break
 				# Do not allow for overlapping buildings
-				if nonOverlapping:
+				if not grid.overlapsAny(newBuildingPadZone):
 					self.buildings.append(newBuilding)
+					grid.insert(newBuilding)
 					buildingsPlaced += 1
 
 					doorWall = {'n': 's', 'e': 'w', 's': 'n', 'w': 'e'}[
 						newBuilding.getNearestWall(block)[0]
 					]
 
-					doorPoint = np.random.choice(
-						list(
-							{
-								'n': newBuilding.edgeCellsNorth,
-								'e': newBuilding.edgeCellsEast,
-								's': newBuilding.edgeCellsSouth,
-								'w': newBuilding.edgeCellsWest
-							}[doorWall]
-						)
+					doorCells = list(
+						{
+							'n': newBuilding.edgeCellsNorth,
+							'e': newBuilding.edgeCellsEast,
+							's': newBuilding.edgeCellsSouth,
+							'w': newBuilding.edgeCellsWest
+						}[doorWall]
 					)
+					doorPoint = doorCells[rng.integers(0, len(doorCells))]
 
 					self.doors.append(Line(doorPoint.x, doorPoint.y, 2, doorWall))
 
@@ -1343,6 +1823,66 @@ class City:
 			print("Attempted building generation", attempts, "times")
 			print("on the block at", block.origin)
 
+		self.storeCachedState(key)
+
+	def gen(self, showProgress : bool = False):
+		"""Lay out the streets, lots, and plazas, then the buildings on them"""
+		self.genLayout(True)
+		if showProgress:
+			print(maskToString(self.draw()))
+
+		self.genBuildings(True)
+		if showProgress:
+			print(maskToString(self.draw()))
+
+	def genConnectors(self, connectors : dict, lines : dict):
+		"""
+		Redraw the width of every street from the seeds of its row or column
+		of chunks (see World.getLineSeeds), so streets keep the same width
+		from one chunk into the next; They already run edge to edge,
+		and lots leave room for the widest street, so nothing else moves
+		"""
+		self.invalidateLayers()
+		rngRow = np.random.Generator(np.random.PCG64(lines["row"]))
+		rngColumn = np.random.Generator(np.random.PCG64(lines["column"]))
+
+		for k, street in enumerate(self.streets):
+			vertical = street.orient.y != 0 # North-South streets cross into the next row
+			rng = rngColumn if vertical else rngRow
+			width = self.streetWidth + rng.integers(
+				-self.varianceStreet, self.varianceStreet + 1
+			)
+			self.streets[k] = Band(
+				street.origin.x, street.origin.y, street.length,
+				's' if vertical else 'e', width
+			)
+
+	def drawLayers(self) -> tuple:
+		"""Rasterize the base layer masks of the city (in the same order as layers mode)"""
+		maskLotAndPlazaEdge = np.zeros(self.size.npar, bool)
+		maskBuildingEdge = np.zeros(self.size.npar, bool)
+		# Edges get stamped one by one
+		for block in self.lots + self.plazas:
+			block.stampEdge(maskLotAndPlazaEdge)
+
+		for building in self.buildings:
+			building.stampEdge(maskBuildingEdge)
+		# Everything else is a union of boxes, so it gets rasterized all at once
+		w, h = self.size.x, self.size.y
+		streetsV = [line for line in self.streets if line.orient.y != 0]
+		streetsH = [line for line in self.streets if line.orient.x != 0]
+		maskStreetV = rasterizeBoxes(collectBoxes(streetsV), w, h)
+		maskStreetH = rasterizeBoxes(collectBoxes(streetsH), w, h)
+		maskLotAndPlazaFill = rasterizeBoxes(collectBoxes(self.lots + self.plazas), w, h)
+		maskBuildingFill = rasterizeBoxes(collectBoxes(self.buildings), w, h)
+		maskDoor = rasterizeBoxes(collectBoxes(self.doors), w, h)
+
+		return (
+			maskStreetV, maskStreetH,
+			maskLotAndPlazaEdge, maskLotAndPlazaFill,
+			maskBuildingEdge, maskBuildingFill, maskDoor
+		)
+
 	def draw(self, mode : str = "") -> np.array:
 		"""
 		Produce a 2D boolean numpy array mask of the city.
@@ -1360,34 +1900,11 @@ class City:
 		* "layers"       : draw all layers and return them in a stack
 		* "image"        : draw all layers needed for imaging (returns a 3D array)
 		"""
-		maskStreetV = np.zeros(self.size.npar, bool)
-		maskStreetH = np.zeros(self.size.npar, bool)
-		maskLotAndPlazaEdge = np.zeros(self.size.npar, bool)
-		maskLotAndPlazaFill = np.zeros(self.size.npar, bool)
-		maskBuildingEdge = np.zeros(self.size.npar, bool)
-		maskBuildingFill = np.zeros(self.size.npar, bool)
-		maskDoor = np.zeros(self.size.npar, bool)
-
-		for line in self.streets:
-			if line.orient.x != 0:
-				maskStreetH |= line.getMask(*self.size.tupl)
-			elif line.orient.y != 0:
-				maskStreetV |= line.getMask(*self.size.tupl)
-
-		for lot in self.lots:
-			maskLotAndPlazaEdge |= lot.getMaskEdge(*self.size.tupl)
-			maskLotAndPlazaFill |= lot.getMaskFill(*self.size.tupl)
-
-		for plaza in self.plazas:
-			maskLotAndPlazaEdge |= plaza.getMaskEdge(*self.size.tupl)
-			maskLotAndPlazaFill |= plaza.getMaskFill(*self.size.tupl)
-
-		for building in self.buildings:
-			maskBuildingEdge |= building.getMaskEdge(*self.size.tupl)
-			maskBuildingFill |= building.getMaskFill(*self.size.tupl)
-
-		for door in self.doors:
-			maskDoor |= door.getMask(*self.size.tupl)
+		(
+			maskStreetV, maskStreetH,
+			maskLotAndPlazaEdge, maskLotAndPlazaFill,
+			maskBuildingEdge, maskBuildingFill, maskDoor
+		) = self.getLayers()
 
 		if mode.upper() == "STREETS":
 			return maskStreetV | maskStreetH
@@ -1396,15 +1913,15 @@ class City:
 		elif mode.upper() == "BUILDINGS":
 			return (maskBuildingEdge & ~maskDoor) | (maskDoor & ~maskBuildingEdge)
 		elif mode.upper() == "BLOCKS":
-			return maskLotAndPlazaFill
+			return maskLotAndPlazaFill.copy()
 		elif mode.upper() == "LAYERS":
-			return np.array((
+			return self.stackLayers((
 				maskStreetV, maskStreetH,
 				maskLotAndPlazaEdge, maskLotAndPlazaFill,
 				maskBuildingEdge, maskBuildingFill, maskDoor
 			))
 		elif mode.upper() == "IMAGE":
-			return np.array((
+			return self.stackLayers((
 				maskLotAndPlazaFill | ~(maskStreetV | maskStreetH),
 				maskBuildingEdge & ~maskDoor,
 				maskBuildingEdge & maskDoor,
@@ -1421,7 +1938,7 @@ class City:
 
 	def getImageData(self) -> dict:
 		"""Separate image layer masks out into values in a dictionary"""
-		layers = self.draw("IMAGE")
+		layers = self.getImageLayers()
 		return {
 			"ground" : layers[0],
 			"wall" : layers[1],
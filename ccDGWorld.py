@@ -0,0 +1,178 @@
+from ccDGLevels import np, Point, Level, getSeedSequence, getChildSeed
+from ccDGLevels import chunkSeedDomain, edgeSeedDomain
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from io import StringIO
+
+def getChunkKey(c : int) -> int:
+	"""Fold a chunk coordinate onto 0, 1, 2, ... (spawn keys can't be negative)"""
+	return 2 * c if c >= 0 else -2 * c - 1
+
+class World:
+	"""
+	Endless grid of same-sized levels (chunks), each generated from its
+	own coordinates and the world seed the first time it gets looked at
+	"""
+	def __init__(
+		self, levelClass : type, params : dict,
+		chunkW : int, chunkH : int, seed : int = None,
+		maxChunks : int = 16, cache = None, connectorCount : int = 1
+	):
+		"""
+		Requires a level class, its (keyword) parameters other than the size,
+		and the width and height of each chunk.
+
+		Optionally, a seed (or numpy Generator) for the world,
+		how many chunks to keep in memory before evicting the least recently
+		used one, a LevelCache for chunks to come back from, and how many
+		connectors to put on each edge between chunks can be given.
+
+		Every cell is decided by the one chunk it falls in, no matter which
+		others are loaded; Neighboring chunks still meet up, since each edge
+		they share gets its own seed from the world seed and the edge's coordinates,
+		which both of them draw the same connectors from (see getConnectors)
+		"""
+		if not issubclass(levelClass, Level):
+			raise TypeError("Please pass a subclass of Level to build a world from.")
+
+		self.levelClass = levelClass
+		self.params = params
+		self.chunkSize = Point(chunkW, chunkH)
+		self.seedSequence = getSeedSequence(seed)
+		self.maxChunks = max(1, maxChunks)
+		self.cache = cache
+		self.connectorCount = max(1, connectorCount)
+		self.chunks = OrderedDict()
+
+	def __str__(self) -> str:
+		"""String representation"""
+		return (
+			"An endless world of {} wide by {} tall {} chunks,\n"
+			+ "with {} of at most {} chunks in memory."
+		).format(
+			self.chunkSize.x, self.chunkSize.y, self.levelClass.__name__,
+			len(self.chunks), self.maxChunks
+		)
+
+	def __repr__(self) -> str:
+		"""Generic representation"""
+		return self.__str__()
+
+	def getChunkSeed(self, cx : int, cy : int) -> np.random.SeedSequence:
+		"""Derive a chunk's seed from the world seed and its coordinates alone"""
+		return getChildSeed(
+			self.seedSequence, chunkSeedDomain, getChunkKey(cx), getChunkKey(cy)
+		)
+
+	def getEdgeSeed(self, cx : int, cy : int, vertical : bool) -> np.random.SeedSequence:
+		"""
+		Derive the seed of the west (if vertical) or north edge of a chunk
+		from the world seed and the edge's coordinates alone,
+		so the chunks on either side of it get the same one
+		"""
+		return getChildSeed(
+			self.seedSequence, edgeSeedDomain, 0 if vertical else 1,
+			getChunkKey(cx), getChunkKey(cy)
+		)
+
+	def getLineSeeds(self, cx : int, cy : int) -> dict:
+		"""
+		Derive the seeds shared by a whole row and a whole column of chunks,
+		for things that run the full length of a chunk (like city streets)
+		"""
+		return {
+			"row" : getChildSeed(self.seedSequence, edgeSeedDomain, 2, getChunkKey(cy)),
+			"column" : getChildSeed(self.seedSequence, edgeSeedDomain, 3, getChunkKey(cx))
+		}
+
+	def getConnectors(self, cx : int, cy : int) -> dict:
+		"""
+		Where a chunk connects to each of its neighbors, as lists of positions along
+		its north, east, south, and west edges (by the side's first letter);
+		Connectors keep to the middle half of each edge, away from the corners
+		"""
+		edges = {
+			'n' : (self.getEdgeSeed(cx, cy, False), self.chunkSize.x),
+			'e' : (self.getEdgeSeed(cx + 1, cy, True), self.chunkSize.y),
+			's' : (self.getEdgeSeed(cx, cy + 1, False), self.chunkSize.x),
+			'w' : (self.getEdgeSeed(cx, cy, True), self.chunkSize.y)
+		}
+		connectors = {}
+		for side, (seed, length) in edges.items():
+			rng = np.random.Generator(np.random.PCG64(seed))
+			margin = length // 4
+			connectors[side] = sorted(
+				rng.integers(margin, length - margin, self.connectorCount).tolist()
+			)
+
+		return connectors
+
+	def getChunkIndex(self, x : int, y : int) -> tuple:
+		"""Which chunk a cell in world coordinates falls in"""
+		return x // self.chunkSize.x, y // self.chunkSize.y
+
+	def getChunk(self, cx : int, cy : int) -> Level:
+		"""Get a chunk (by chunk coordinates), generating it if it isn't in memory"""
+		key = (cx, cy)
+		if key in self.chunks:
+			self.chunks.move_to_end(key)
+			return self.chunks[key]
+
+		with redirect_stdout(StringIO()): # Keep the generation printouts quiet
+			chunk = self.levelClass(
+				w = self.chunkSize.x, h = self.chunkSize.y, **self.params,
+				seed = self.getChunkSeed(cx, cy)
+			)
+			if self.cache is not None:
+				chunk.useCache(self.cache)
+
+			chunk.gen()
+			chunk.genConnectors(self.getConnectors(cx, cy), self.getLineSeeds(cx, cy))
+
+		self.chunks[key] = chunk
+		while len(self.chunks) > self.maxChunks: # Evict the least recently used
+			self.chunks.popitem(last = False)
+
+		return chunk
+
+	def draw(self, x0 : int, y0 : int, x1 : int, y1 : int, mode : str = ""):
+		"""
+		Draw a window of the world, from (x0, y0) up to but not including (x1, y1),
+		in any of the chunk level's draw modes; Modes that give many masks
+		give them back the same way (as a tuple or a stack of windows)
+		"""
+		w, h = max(0, x1 - x0), max(0, y1 - y0)
+		windows = None
+		cx0, cy0 = self.getChunkIndex(x0, y0)
+		cx1, cy1 = self.getChunkIndex(x1 - 1, y1 - 1)
+
+		for cy in range(cy0, cy1 + 1):
+			for cx in range(cx0, cx1 + 1):
+				drawn = self.getChunk(cx, cy).draw(mode)
+				single = not isinstance(drawn, tuple)
+				if single:
+					drawn = (drawn,)
+				# Unpacks chunks with packed layers
+				drawn = tuple(np.asarray(layer) for layer in drawn)
+
+				if windows is None:
+					windows = tuple(
+						np.zeros(layer.shape[:-2] + (h, w), layer.dtype) for layer in drawn
+					)
+				# The overlap of the chunk and the window, in world coordinates
+				ox, oy = cx * self.chunkSize.x, cy * self.chunkSize.y
+				wx0, wy0 = max(x0, ox), max(y0, oy)
+				wx1 = min(x1, ox + self.chunkSize.x)
+				wy1 = min(y1, oy + self.chunkSize.y)
+				for window, layer in zip(windows, drawn):
+					window[..., wy0 - y0:wy1 - y0, wx0 - x0:wx1 - x0] = \
+						layer[..., wy0 - oy:wy1 - oy, wx0 - ox:wx1 - ox]
+
+		if windows is None: # Empty window
+			return np.zeros((h, w), bool)
+
+		return windows[0] if single else windows
+
+	def drawView(self, x : int, y : int, radius : int, mode : str = ""):
+		"""Draw the square of cells within a radius of a cell in world coordinates"""
+		return self.draw(x - radius, y - radius, x + radius + 1, y + radius + 1, mode)
@@ -0,0 +1,63 @@
+from contextlib import redirect_stdout
+from io import StringIO
+import json
+import os
+
+import numpy as np
+import pytest
+
+from ccDGLevels import Catacombs, Caves, City
+from ccDGArchive import saveLevel, loadLevel
+
+def makeLevels() -> dict:
+	with redirect_stdout(StringIO()):
+		levels = {
+			"catacombs" : Catacombs(80, 60, 8, 0.02, 2, 2, 2, True, 2, 2, 2, 1, seed = 2),
+			"caves" : Caves(120, 80, 5, 0.01, 0.5, 4, 3., 1, 1, 2, 2, 2, 1, 10., seed = 2),
+			"city" : City(
+				100, 80, 4, 3, 3, 1, 2, 0.8, 0.15, 0.2, 0.5, 2, 1, False, 1, 1, 1, 1,
+				seed = 2
+			)
+		}
+		for level in levels.values():
+			level.gen()
+
+	return levels
+
+@pytest.mark.parametrize("packed", [False, True])
+@pytest.mark.parametrize("name", ["catacombs", "caves", "city"])
+def test_round_trip(tmp_path, name, packed):
+	level = makeLevels()[name]
+	level.usePackedLayers(packed)
+	saveLevel(level, str(tmp_path))
+	loaded = loadLevel(str(tmp_path))
+	for mode in ("", "IMAGE"):
+		assert np.array_equal(np.asarray(loaded.draw(mode)), np.asarray(level.draw(mode)))
+	# Saving the loaded level again gives back the same layers
+	saveLevel(loaded, str(tmp_path / "again"))
+	again = loadLevel(str(tmp_path / "again"))
+	assert np.array_equal(again.draw(), level.draw())
+
+def test_caves_layers_are_bit_planes(tmp_path):
+	level = makeLevels()["caves"]
+	saveLevel(level, str(tmp_path))
+	with open(os.path.join(str(tmp_path), "meta.json")) as file:
+		descriptions = json.load(file)["layers"]
+
+	assert len(descriptions) == 10
+	for description in descriptions:
+		rows = np.load(os.path.join(str(tmp_path), description["file"]))
+		assert rows.dtype == np.uint8
+		assert rows.shape == (80, 15) # 120 cells to a row, 8 to a byte
+
+def test_layers_only_read_their_own_file(tmp_path):
+	level = makeLevels()["caves"]
+	saveLevel(level, str(tmp_path))
+	loaded = loadLevel(str(tmp_path))
+	for k in range(10):
+		if k != 7:
+			os.remove(os.path.join(str(tmp_path), "layer{:d}.npy".format(k)))
+
+	expected = level.splitLabels(level.getLayers()[0])[7]
+	assert np.array_equal(loaded.layerCache[7], expected)
+	assert np.array_equal(loaded.layerCache.getWindow(7, 10, 20, 30, 50), expected[10:20, 30:50])
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+from ccDGLevels import Catacombs
+from ccDGBatch import generateLevel, generateLevels
+
+params = dict(
+	rct = 6, raap = 0.02, varix = 2, variy = 2, conn = 2, doShift = True,
+	w = 60, h = 40
+)
+
+def test_seed_in_params_fails_on_the_call():
+	with pytest.raises(ValueError, match = "seeds argument"):
+		generateLevels(Catacombs, dict(params, seed = 3), range(4))
+
+def test_pool_matches_single_runs():
+	results = dict(generateLevels(Catacombs, params, range(4), workers = 2))
+	assert sorted(results) == list(range(4))
+	for seed, level in results.items():
+		assert np.array_equal(level.draw(), generateLevel(Catacombs, params, seed)[1].draw())
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from ccDGGeom import Circle, CircleSet
+
+def makeCircles(rng, n : int, spread : int) -> CircleSet:
+	return CircleSet([
+		Circle(int(x), int(y), 1) for x, y in rng.integers(-spread, spread, (n, 2))
+	])
+
+@pytest.mark.parametrize("spread", [3, 40, 400])
+def test_nearest_indices_match_brute_force(spread):
+	rng = np.random.default_rng(spread)
+	circles = makeCircles(rng, 60, spread)
+	C = circles.getCentroids()
+	D = np.abs(C[:, np.newaxis] - C[np.newaxis]).sum(axis = 2)
+	for k in (1, 4, 59):
+		nearest = circles.getNearestIndices(k)
+		for i in range(len(C)):
+			others = [j for j in range(len(C)) if j != i]
+			expected = sorted(others, key = lambda j : (D[i, j], j))[:k]
+			assert nearest[i].tolist() == expected
+
+def test_connecting_pairs_bridge_far_clumps():
+	rng = np.random.default_rng(0)
+	P = np.concatenate([rng.integers(0, 20, (30, 2)), rng.integers(900, 920, (30, 2))])
+	circles = CircleSet([Circle(int(x), int(y), 1) for x, y in P])
+	pairs = circles.getConnectingPairs(0., k = 2)
+	assert len(pairs) == len(circles) - 1
+	# Every shape is reachable from the first one along the pairs
+	reached = {0}
+	while True:
+		more = {int(j) for i, j in pairs if i in reached} | {int(i) for i, j in pairs if j in reached}
+		if more <= reached:
+			break
+		reached |= more
+	assert reached == set(range(len(circles)))
+
+def test_stencil_cache_stays_within_its_byte_budget():
+	from ccDGGeom import StencilCache, getStencilBytes, buildCircleStencil
+
+	budget = 3 * getStencilBytes(buildCircleStencil(80, True))
+	cache = StencilCache(budget)
+	cache.prewarm(1, 80)
+	assert 0 < cache.getMemoryUsage() <= budget
+	assert cache.getMemoryUsage() == sum(
+		getStencilBytes(stencil) for stencil in cache.stencils.values()
+	)
+	# The most recently used stencils are the ones left
+	assert (80, True) in cache.stencils
+	assert (1, True) not in cache.stencils
+	# A stencil bigger than the whole budget still gets handed back and kept
+	cache.get(200)
+	assert list(cache.stencils) == [(200, True)]
@@ -0,0 +1,85 @@
+from contextlib import redirect_stdout
+import os
+from io import StringIO
+
+import numpy as np
+import pytest
+
+from ccDGLevels import Catacombs, Caves, City
+from ccDGLevels import getSeedSequence, getChildStream, levelStreamDomain
+from ccDGLevels import rendererStreamDomain
+
+repoRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def quiet(f, *args, **kwargs):
+	with redirect_stdout(StringIO()):
+		return f(*args, **kwargs)
+
+def makeCatacombs(seed = None) -> Catacombs:
+	return quiet(Catacombs, 80, 60, 8, 0.02, 2, 2, 2, True, 2, 2, 2, 1, seed = seed)
+
+def makeCaves(seed = None) -> Caves:
+	return quiet(Caves, 120, 80, 5, 0.01, 0.5, 4, 3., 1, 1, 2, 2, 2, 1, 10., seed = seed)
+
+def makeCity(seed = None) -> City:
+	return quiet(
+		City, 100, 80, 4, 3, 3, 1, 2, 0.8, 0.15, 0.2, 0.5, 2, 1, False, 1, 1, 1, 1,
+		seed = seed
+	)
+
+@pytest.mark.parametrize("make", [makeCatacombs, makeCaves, makeCity])
+def test_same_seed_same_level(make):
+	a = make(7)
+	b = make(7)
+	quiet(a.gen)
+	quiet(b.gen)
+	assert (a.draw() == b.draw()).all()
+
+@pytest.mark.parametrize("make", [makeCatacombs, makeCaves, makeCity])
+def test_reroll_changes_and_reseed_reproduces(make):
+	level = make()
+	quiet(level.gen)
+	first = level.draw().copy()
+	rolls = [first]
+	for _ in range(3): # Any one re-roll could match by chance, not all of them
+		quiet(level.gen)
+		rolls.append(level.draw().copy())
+
+	assert any((roll != first).any() for roll in rolls[1:])
+
+	level.setSeed(11)
+	quiet(level.gen)
+	reseeded = level.draw().copy()
+	fresh = make(11)
+	quiet(fresh.gen)
+	assert (reseeded == fresh.draw()).all()
+
+def test_renderer_stream_never_matches_level_streams():
+	seed = getSeedSequence(1234)
+	variants = getChildStream(seed, rendererStreamDomain, 0).uniform(size = 16)
+	level = makeCatacombs(1234)
+	for k, phase in enumerate(level.streamPhases):
+		for n in range(3):
+			stream = getChildStream(level.seedSequence, levelStreamDomain, k, n)
+			assert not np.allclose(stream.uniform(size = 16), variants)
+		# Including the stream the level holds right now
+		assert not np.allclose(level.streams[phase].uniform(size = 16), variants)
+
+def test_renderer_uses_its_own_stream():
+	pytest.importorskip("cv2")
+	from ccDGImaging import Renderer, loadTileInfo
+
+	level = makeCatacombs(1234)
+	quiet(level.gen)
+	tileInfo = loadTileInfo(os.path.join(repoRoot, "blacklightStyle1.json"))
+	cwd = os.getcwd()
+	os.chdir(repoRoot) # The style's tile paths are relative to the repository
+	try:
+		renderer = quiet(Renderer, level, tileInfo, 4)
+	finally:
+		os.chdir(cwd)
+
+	variants = renderer.getVariantStream().uniform(size = 16)
+	for k in range(len(level.streamPhases)):
+		stream = getChildStream(level.seedSequence, levelStreamDomain, k, 0)
+		assert not np.allclose(stream.uniform(size = 16), variants)
@@ -0,0 +1,108 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from ccDGLevels import Catacombs, Caves, City
+from ccDGWorld import World
+
+catacombsParams = dict(
+	rct = 8, raap = 0.02, varix = 2, variy = 2, conn = 2, doShift = True,
+	padx = 2, pady = 2, thick = 2, varih = 1
+)
+cavesParams = dict(
+	rct = 5, raap = 0.01, carvep = 0.5, carven = 4, carveq = 3., carver = 1,
+	vari = 1, conn = 2, pad = 2, thick = 2, varihr = 1, variha = 10.
+)
+cityParams = dict(
+	streetv = 4, streeth = 3, streetw = 3, varis = 1, buildingc = 2,
+	buildingp = 0.8, baap = 0.15, plazap = 0.2, plazabp = 0.5,
+	plazax = 2, plazay = 1, plazao = False
+)
+# Level class, parameters, chunk size, and the mode to walk through
+worlds = {
+	"catacombs" : (Catacombs, catacombsParams, 80, 60, "NOWALLS"),
+	"caves" : (Caves, cavesParams, 120, 80, "NONSOLID")
+}
+
+def isConnected(mask : np.array, start : tuple, goal : tuple) -> bool:
+	"""Walk from one (y, x) cell of a mask to another through its set cells"""
+	seen = np.zeros_like(mask)
+	queue = deque([start])
+	seen[start] = True
+	while queue:
+		y, x = queue.popleft()
+		if (y, x) == goal:
+			return True
+		for ny, nx in ((y + 1, x), (y - 1, x), (y, x + 1), (y, x - 1)):
+			if 0 <= ny < mask.shape[0] and 0 <= nx < mask.shape[1] \
+				and mask[ny, nx] and not seen[ny, nx]:
+				seen[ny, nx] = True
+				queue.append((ny, nx))
+
+	return False
+
+def getNearestCentroid(chunk, side : str, position : int) -> tuple:
+	"""The (y, x) centroid of the room a connector gets routed to"""
+	cell, _ = chunk.getEdgeCell(side, position)
+	x, y = chunk.rooms.getCentroids()[chunk.getNearestRoom(cell)].tolist()
+	return y, x
+
+@pytest.mark.parametrize("name", sorted(worlds))
+def test_neighbors_share_connectors(name):
+	levelClass, params, w, h, _ = worlds[name]
+	world = World(levelClass, params, w, h, seed = 3, connectorCount = 2)
+	assert world.getConnectors(0, 0)['e'] == world.getConnectors(1, 0)['w']
+	assert world.getConnectors(0, 0)['s'] == world.getConnectors(0, 1)['n']
+	assert world.getConnectors(-1, -1)['e'] == world.getConnectors(0, -1)['w']
+
+@pytest.mark.parametrize("name", sorted(worlds))
+@pytest.mark.parametrize("seed", range(3))
+def test_chunks_connect_across_borders(name, seed):
+	levelClass, params, w, h, mode = worlds[name]
+	world = World(levelClass, params, w, h, seed = seed)
+	across = world.draw(0, 0, 2 * w, h, mode) # West and east chunks
+	down = world.draw(0, 0, w, 2 * h, mode) # North and south chunks
+
+	for y in world.getConnectors(0, 0)['e']:
+		assert across[y, w - 1] and across[y, w]
+		west = getNearestCentroid(world.getChunk(0, 0), 'e', y)
+		y1, x1 = getNearestCentroid(world.getChunk(1, 0), 'w', y)
+		assert isConnected(across, west, (y1, x1 + w))
+
+	for x in world.getConnectors(0, 0)['s']:
+		assert down[h - 1, x] and down[h, x]
+		north = getNearestCentroid(world.getChunk(0, 0), 's', x)
+		y1, x1 = getNearestCentroid(world.getChunk(0, 1), 'n', x)
+		assert isConnected(down, north, (y1 + h, x1))
+
+@pytest.mark.parametrize("name", sorted(worlds))
+def test_generation_order_does_not_matter(name):
+	levelClass, params, w, h, mode = worlds[name]
+	first = World(levelClass, params, w, h, seed = 5)
+	second = World(levelClass, params, w, h, seed = 5, maxChunks = 1)
+	second.getChunk(1, 1)
+	second.getChunk(0, 1)
+	assert (first.draw(0, 0, 2 * w, 2 * h, mode) == second.draw(0, 0, 2 * w, 2 * h, mode)).all()
+
+def test_city_streets_line_up():
+	w, h = 60, 40
+	world = World(City, cityParams, w, h, seed = 3)
+	for cy in (-1, 0, 1):
+		west = world.getChunk(0, cy).draw("LAYERS")
+		east = world.getChunk(1, cy).draw("LAYERS")
+		# East-West streets carry on into the chunk to the east
+		assert west[1][:, -1].any()
+		assert (west[1][:, -1] == east[1][:, 0]).all()
+
+	for cx in (-1, 0, 1):
+		north = world.getChunk(cx, 0).draw("LAYERS")
+		south = world.getChunk(cx, 1).draw("LAYERS")
+		# North-South streets carry on into the chunk to the south
+		assert north[0][-1].any()
+		assert (north[0][-1] == south[0][0]).all()
+
+	streets = world.draw(0, 0, 2 * w, 2 * h, "STREETS")
+	start = tuple(np.argwhere(streets[:h, :w])[0])
+	goal = tuple(np.argwhere(streets[h:, w:])[-1] + (h, w))
+	assert isConnected(streets, start, goal)